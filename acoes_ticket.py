@@ -0,0 +1,75 @@
+"""
+Padrões compartilhados para interpretar o texto da coluna "Ações" da exportação.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Separador entre as ações de um ticket na coluna "Ações"
+ACTION_SEPARATOR = "-----------------------------"
+
+# Cabeçalho de cada ação. Ex: "3 - Ação criada por Alan Augusto em 05/08/2025 15:47Muito obrigado..."
+ACTION_HEADER_PATTERN = re.compile(
+    r"^\s*(?P<numero>\d+)\s*-\s*Ação criada por (?P<autor>.+?) em (?P<data>\d{2}/\d{2}/\d{4} \d{2}:\d{2})"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token)."""
+    return len(text) // 4 + 1
+
+
+# (número, autor, data ISO) do cabeçalho de uma ação
+ActionHeader = Tuple[int, str, str]
+
+
+def parse_action_header(action_text: Optional[str]) -> Optional[ActionHeader]:
+    """Lê número, autor e data do cabeçalho de uma ação."""
+    match = ACTION_HEADER_PATTERN.match(action_text) if isinstance(action_text, str) else None
+    if not match:
+        return None
+    try:
+        created_at = datetime.strptime(match.group("data"), "%d/%m/%Y %H:%M").isoformat(timespec="minutes")
+    except ValueError:
+        return None
+    return int(match.group("numero")), match.group("autor"), created_at
+
+
+def action_timestamp(action_text: Optional[str]) -> Optional[str]:
+    """Data da ação no formato ISO, lida do cabeçalho ("... em 05/08/2025 15:47")."""
+    header = parse_action_header(action_text)
+    return header[2] if header else None
+
+
+def action_headers(actions_text: Optional[str], after: int = 0) -> List[ActionHeader]:
+    """Cabeçalhos das ações de número maior que `after`, em ordem crescente."""
+    if not actions_text or not isinstance(actions_text, str):
+        return []
+    headers = (parse_action_header(action.strip()) for action in actions_text.split(ACTION_SEPARATOR))
+    return sorted(header for header in headers if header and header[0] > after)
+
+
+def last_action_details(actions_text: Optional[str]) -> Tuple[int, Optional[str]]:
+    """Extrai o número e o texto da última ação."""
+    if not actions_text or not isinstance(actions_text, str):
+        return 0, None
+
+    actions = actions_text.split(ACTION_SEPARATOR)
+    last_action_text = None
+    max_number = 0
+
+    for action in actions:
+        if not action.strip():
+            continue
+        try:
+            # Extrai o número da ação. Ex: "1 - Ação..." -> 1
+            number_str = action.strip().split(" ")[0]
+            number = int(number_str)
+            if number > max_number:
+                max_number = number
+                last_action_text = action.strip()
+        except (ValueError, IndexError):
+            continue
+
+    return max_number, last_action_text
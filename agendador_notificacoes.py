@@ -0,0 +1,41 @@
+"""
+Prioridades das notificações do Slack e limite de envio por canal.
+
+A ordem por prioridade, o limite de cada canal (token bucket abaixo) e a medição da espera
+na fila por prioridade ficam com o envio da caixa de saída (enviar_notificacoes.py), que
+substituiu o agendador em memória: a análise só grava as notificações.
+"""
+
+# Prioridades (menor valor = enviado primeiro)
+PRIORITY_CLOSED = 0   # Ticket fechado/resolvido
+PRIORITY_NEW = 1      # Ticket novo
+PRIORITY_UPDATE = 2   # Nova ação em ticket já monitorado
+
+PRIORITY_NAMES = {PRIORITY_CLOSED: "fechamento", PRIORITY_NEW: "novo", PRIORITY_UPDATE: "atualizacao"}
+
+
+class TokenBucket:
+    """Token bucket simples: `rate` envios por segundo com rajada de até `capacity`."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_consume(self, now: float) -> bool:
+        """Consome um token se houver disponível."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """Segundos até o próximo token ficar disponível."""
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
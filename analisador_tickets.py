@@ -4,16 +4,32 @@ Script para análise de tickets e integração com Gemini e Slack.
 """
 
 import os
+import re
 import json
+import time
 import logging
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Iterator
 import google.generativeai as genai
-import requests
 from dotenv import load_dotenv
 import subprocess
+from contextlib import contextmanager
+from acoes_ticket import ACTION_HEADER_PATTERN, action_timestamp
+from limpeza_acoes import ActionCleaner, extractive_summary
+from controle_execucao import RunDeadline, RunReport, RunLock
+from leitor_csv import LazyActionsReader, TicketRow
+from leitor_paralelo import ParallelExportParser
+from roteamento_slack import ChannelRouter, normalize_key
+from tickets_fechados import ClosedTicketTombstones
+from sla_tickets import SlaTracker
+from registro_logs import setup_async_logging
+from resumo_gemini import GeminiSummarizer
+from perfil_llm import LlmProfiler
+from agendador_notificacoes import PRIORITY_CLOSED, PRIORITY_NEW, PRIORITY_UPDATE
+from pipeline_notificacoes import NotificationPipeline, PipelineItem
+from fila_notificacoes import NotificationOutbox, WEBHOOK_DYNAMIC, WEBHOOK_MAIN
 
 # Carrega variáveis de ambiente
 load_dotenv()
@@ -21,25 +37,117 @@ load_dotenv()
 # Configuração do Gemini
 genai.configure(api_key=os.getenv("GOOGLE_AI_API_KEY"))
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/analise_tickets.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configuração de logging (assíncrono, com rotação e compactação)
+setup_async_logging("analise_tickets.log", "INFO")
+
+class InternalAuthorMatcher:
+    """Identifica ações de autores internos.
+
+    A lista de autores é compilada uma única vez, com nomes normalizados como no roteamento
+    do Slack (sem acentos, caixa e espaços extras): um conjunto para a busca exata pelo
+    autor do cabeçalho da ação e uma regex única com todos os nomes. A regex aceita um nome
+    da lista contido no autor como sequência de palavras inteiras ("Ana" em "Ana Paula
+    Souza", mas não em "Mariana") e também faz a varredura do texto completo (fallback
+    quando não há cabeçalho, ou sempre no modo "texto").
+    """
+
+    def __init__(self, autores: List[str], mode: str = "cabecalho"):
+        self.mode = mode
+        self.normalized_authors = {}
+        for autor in autores:
+            normalized = self._normalize(autor)
+            if normalized:
+                self.normalized_authors.setdefault(normalized, autor.strip())
+        # Nomes mais longos primeiro, para que "Ana Paula" vença "Ana" na alternância
+        alternation = "|".join(re.escape(name) for name in sorted(self.normalized_authors, key=len, reverse=True))
+        self.name_pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)") if alternation else None
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        """Normaliza o nome: remove o sufixo de ramal ("*127"), acentos, espaços extras e caixa."""
+        return normalize_key(re.sub(r"\*\d+$", "", name.strip()))
+
+    def _match_name(self, author: str) -> Optional[str]:
+        """Autor interno correspondente ao nome lido do cabeçalho: exato ou por palavras inteiras."""
+        normalized = self._normalize(author)
+        exact = self.normalized_authors.get(normalized)
+        if exact is not None:
+            return exact
+        match = self.name_pattern.search(normalized)
+        return self.normalized_authors[match.group(0)] if match else None
+
+    @staticmethod
+    def parse_author(action_text: str) -> Optional[str]:
+        """Extrai o autor do cabeçalho "Ação criada por <nome> em"."""
+        match = ACTION_HEADER_PATTERN.match(action_text)
+        return match.group("autor") if match else None
+
+    def match(self, action_text: str) -> Optional[str]:
+        """Retorna o autor interno da ação, ou None se a ação for externa."""
+        if not action_text or not self.normalized_authors:
+            return None
+
+        if self.mode != "texto":
+            author = self.parse_author(action_text)
+            if author is not None:
+                return self._match_name(author)
+
+        # Fallback: varredura do texto completo com a regex compilada
+        match = self.name_pattern.search(normalize_key(action_text))
+        return self.normalized_authors[match.group(0)] if match else None
+
+    def is_internal_name(self, author: str) -> bool:
+        """Indica se o autor lido de um cabeçalho de ação é interno."""
+        return bool(self.normalized_authors) and self._match_name(author) is not None
+
 
 class TicketAnalyzer:
-    def __init__(self):
-        self.memory_file = Path("data/ticket_memory.json")
+    def __init__(self, data_dir: Path = Path("data"), summarizer: Optional[GeminiSummarizer] = None,
+                 git_sync: bool = True, report_dir: Path = Path("logs")):
+        # data_dir, summarizer, git_sync e report_dir permitem rodar o analisador isolado (ex.: replay_exportacoes)
+        self.memory_file = data_dir / "ticket_memory.json"
+        # Arquivos de estado versionados junto com a memória (ex.: plano de exportação por shards)
+        self.export_state_file = data_dir / "export_state.json"
+        self.git_sync = git_sync
+        self.tombstones = ClosedTicketTombstones(
+            data_dir / "closed_tickets.json", max_age_days=int(os.getenv("TICKETS_FECHADOS_DIAS", "90"))
+        )
         self.autores_internos = os.getenv("AUTORES_INTERNOS", "").split(",")
-        self.slack_webhook = os.getenv("SLACK_WEBHOOK_URL")  # Principal/Padrão
-        self.slack_dynamic_webhook = os.getenv("SLACK_DYNAMIC_WEBHOOK_URL")  # Para notificações de ticket
+        self.author_matcher = InternalAuthorMatcher(self.autores_internos, os.getenv("AUTOR_MATCH_MODE", "cabecalho"))
+        self.sla = SlaTracker(self.author_matcher.is_internal_name, data_dir / "sla_clientes.json")
         self.slack_default_channel = os.getenv("SLACK_CHANNEL")
         self.slack_file_update_channel = os.getenv("SLACK_FILE_UPDATE_CHANNEL")
-        self.channel_map = self._load_channel_mapping()
+        self.channel_router = ChannelRouter(self.slack_default_channel)
+        # As notificações vão para a caixa de saída; o envio (e o limite do Slack) fica com enviar_notificacoes.py
+        self.outbox = NotificationOutbox(data_dir / "notificacoes.jsonl")
+        # Resumo e gravação correm em paralelo à leitura, com teto de tickets em andamento
+        self.pipeline_summary_workers = int(os.getenv("PIPELINE_THREADS_RESUMO", "2"))
+        self.pipeline_max_in_flight = int(os.getenv("PIPELINE_MAX_EM_ANDAMENTO", "200"))
+        self.pipeline_batch_linger = float(os.getenv("PIPELINE_ESPERA_LOTE_S", "0.2"))
+        self.deadline = RunDeadline.from_env()
+        self.report = RunReport("analise", report_dir)
+        # Leitor da exportação: "auto" usa o mmap preguiçoso acima de CSV_LEITOR_LAZY_MIN_MB
+        self.csv_reader_mode = os.getenv("CSV_LEITOR_LAZY", "auto").lower()
+        self.csv_lazy_min_bytes = int(float(os.getenv("CSV_LEITOR_LAZY_MIN_MB", "20")) * 1024 * 1024)
+        # Leitura paralela (independente de CSV_LEITOR_LAZY): "auto" divide a leitura entre CSV_LEITOR_PROCESSOS
+        # processos acima de CSV_LEITOR_PARALELO_MIN_MB
+        self.csv_parallel_mode = os.getenv("CSV_LEITOR_PARALELO", "auto").lower()
+        self.csv_parallel_min_bytes = int(float(os.getenv("CSV_LEITOR_PARALELO_MIN_MB", "64")) * 1024 * 1024)
+        self.csv_workers = int(os.getenv("CSV_LEITOR_PROCESSOS", str(os.cpu_count() or 1)))
+        self.action_cleaner = ActionCleaner(bypass_chars=int(os.getenv("LIMPEZA_LIMITE_SEM_GEMINI", "280")))
+        self.summarizer = summarizer or GeminiSummarizer(
+            batch_token_budget=int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", "6000")),
+            batch_max_items=int(os.getenv("GEMINI_BATCH_MAX_ITEMS", "20")),
+            request_timeout=float(os.getenv("GEMINI_TIMEOUT_S", "60")),
+        )
+        self.llm_profiler = LlmProfiler(data_dir / "llm_uso.json")
+        self.summarizer.profiler = self.llm_profiler
+        # A caixa de saída entra no mesmo commit da memória: uma ação só é dada como tratada
+        # no repositório junto com a notificação dela
+        self.state_files = [
+            self.memory_file, self.export_state_file, self.tombstones.path, self.sla.path, self.llm_profiler.path,
+            self.outbox.path,
+        ]
         
         # Garante que o diretório data existe
         self.memory_file.parent.mkdir(exist_ok=True)
@@ -48,17 +156,6 @@ class TicketAnalyzer:
         self.memory = self._load_memory()
         logging.info(f"Memória carregada com {len(self.memory)} tickets")
     
-    def _load_channel_mapping(self) -> Dict[str, str]:
-        """Carrega o mapeamento de autores para canais a partir de uma variável de ambiente JSON."""
-        mapping_json = os.getenv("SLACK_CHANNEL_MAPPING", "{}")
-        try:
-            mapping = json.loads(mapping_json)
-            logging.info(f"Mapeamento de canais carregado para {len(mapping)} autores.")
-            return mapping
-        except json.JSONDecodeError:
-            logging.error("Erro ao decodificar SLACK_CHANNEL_MAPPING. Verifique o formato JSON.")
-            return {}
-    
     def _load_memory(self) -> Dict[str, Any]:
         """Carrega o arquivo de memória ou cria um novo se não existir."""
         try:
@@ -70,180 +167,368 @@ class TicketAnalyzer:
             logging.error(f"Erro ao carregar memória: {str(e)}")
             return {}
     
-    def _save_memory(self):
-        """Salva o arquivo de memória, faz commit, push e notifica no canal específico sobre a atualização."""
-        # Salva o arquivo
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            json.dump(self.memory, f, ensure_ascii=False, indent=2)
-        
+    def _save_memory(self, memory_changed: bool = True):
+        """Salva o arquivo de memória, faz commit e push dos arquivos de estado e notifica no canal
+        específico quando a memória foi atualizada.
+
+        Os demais arquivos de estado (indicador da exportação, lápides, SLA, uso do LLM, caixa de
+        saída) podem mudar sem que a memória mude, e são versionados sempre que algum mudou.
+        """
+        if memory_changed:
+            with open(self.memory_file, 'w', encoding='utf-8') as f:
+                json.dump(self.memory, f, ensure_ascii=False, indent=2)
+
+        if not self.git_sync:
+            return
+
+        # O commit e o push nunca são adiados: no GitHub Actions o runner é descartado ao fim
+        # da rodada, e o estado não enviado se perderia. Com o prazo curto, só o aviso no Slack espera
         # Configura o Git
         try:
             subprocess.run(['git', 'config', '--global', 'user.email', 'github-actions@github.com'], check=True)
             subprocess.run(['git', 'config', '--global', 'user.name', 'GitHub Actions'], check=True)
-            subprocess.run(['git', 'add', str(self.memory_file)], check=True)
+            subprocess.run(['git', 'add'] + [str(f) for f in self.state_files if f.exists()], check=True)
             
             result = subprocess.run(['git', 'diff', '--staged', '--quiet'], capture_output=True)
             if result.returncode == 1:
-                commit_message = f'chore: atualiza memória de tickets - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+                subject = "memória de tickets" if memory_changed else "estado da análise"
+                commit_message = f'chore: atualiza {subject} - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
                 subprocess.run(['git', 'commit', '-m', commit_message], check=True)
                 subprocess.run(['git', 'push'], check=True)
-                logging.info("Memória atualizada e enviada para o GitHub")
-                
+                logging.info("Arquivos de estado atualizados e enviados para o GitHub")
+
+                if not memory_changed:
+                    return
+                if self.deadline.is_low():
+                    self.report.record_degradation("notificacao_arquivo", "aviso de atualização do arquivo adiado")
+                    return
+
                 repo_url = f"{os.getenv('GITHUB_SERVER_URL', 'https://github.com')}/{os.getenv('GITHUB_REPOSITORY')}"
                 update_message = f"✅ O arquivo `ticket_memory.json` foi atualizado no repositório.\nConsulte as alterações em: {repo_url}/commits"
-                self._send_to_slack(update_message, channel_override=self.slack_file_update_channel)
+                self._send_to_slack(update_message, channel_override=self.slack_file_update_channel,
+                                    ticket_id="ticket_memory.json", action_number=int(time.time()))
             else:
-                logging.info("Nenhuma mudança na memória para commitar")
+                logging.info("Nenhuma mudança nos arquivos de estado para commitar")
         except subprocess.CalledProcessError as e:
             logging.error(f"Erro ao salvar memória no GitHub: {str(e)}")
     
-    def _get_last_action_details(self, actions_text: str) -> Tuple[int, Optional[str]]:
-        """Extrai o número e o texto da última ação."""
-        if not actions_text or not isinstance(actions_text, str):
-            return 0, None
-            
-        actions = actions_text.split("-----------------------------")
-        last_action_text = None
-        max_number = 0
-        
-        for action in actions:
-            if not action.strip():
-                continue
-            try:
-                # Extrai o número da ação. Ex: "1 - Ação..." -> 1
-                number_str = action.strip().split(" ")[0]
-                number = int(number_str)
-                if number > max_number:
-                    max_number = number
-                    last_action_text = action.strip()
-            except (ValueError, IndexError):
-                continue
-        
-        return max_number, last_action_text
-    
-    def _format_with_gemini(self, text: str) -> str:
-        """Formata o texto usando o Gemini."""
+    def _confirm_export_probe(self):
+        """Confirma o indicador de mudança da exportação analisada, para a próxima rodada compará-lo."""
         try:
-            model = genai.GenerativeModel('gemini-1.5-flash') # Modelo atualizado
-            response = model.generate_content(
-                f"Resuma e formate o seguinte texto de uma ação de ticket. Remova saudações, assinaturas e informações de rodapé, focando apenas no conteúdo principal da mensagem:\n\n{text}"
-            )
-            return response.text
+            if not self.export_state_file.exists():
+                return
+            with open(self.export_state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("pending_probe"):
+                state["last_probe"] = state.pop("pending_probe")
+                with open(self.export_state_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
         except Exception as e:
-            logging.error(f"Erro ao formatar com Gemini: {str(e)}")
-            return text
+            logging.error(f"Erro ao confirmar indicador da exportação: {str(e)}")
+
+    def _format_batch_with_gemini(self, texts: Dict[str, str]) -> Dict[str, str]:
+        """Formata várias ações (ticket_id -> texto) com o mínimo de chamadas ao Gemini.
+
+        Para quando o prazo da rodada fica curto; os itens não formatados ficam de fora.
+        """
+        return self.summarizer.summarize_batch(texts, deadline=self.deadline)
+
+    def _summarize_actions(self, actions: Dict[str, str]) -> Dict[str, str]:
+        """Limpa as ações localmente e só envia ao Gemini as que ainda precisam de resumo."""
+        summaries: Dict[str, str] = {}
+        to_format = {}
+        for ticket_id, action_text in actions.items():
+            cleaned = self.action_cleaner.clean(action_text)
+            if cleaned.bypass_llm:
+                summaries[ticket_id] = cleaned.text
+            else:
+                to_format[ticket_id] = cleaned
+
+        summaries.update(self._format_batch_with_gemini({ticket_id: c.text for ticket_id, c in to_format.items()}))
+
+        # Sem prazo para o Gemini: usa o resumo extrativo local
+        local_only = [ticket_id for ticket_id in to_format if ticket_id not in summaries]
+        if local_only:
+            self.report.record_degradation("resumo", f"{len(local_only)} ações com resumo local (prazo da rodada curto)")
+        for ticket_id in local_only:
+            summaries[ticket_id] = extractive_summary(to_format[ticket_id])
+        if local_only:
+            self.llm_profiler.record_fallback(len(local_only))
+        return summaries
+
+    def _render_notification(self, item: PipelineItem) -> str:
+        """Monta a mensagem do Slack de um ticket alterado já resumido."""
+        context = item.context
+        return f"{context['title']}\n*Responsável:* {context['responsavel']}\n*Cliente:* {context['cliente']}\n*Status:* {context['status']}\n*Última Ação:*\n{item.summary}"
+
+    def _notification_pipeline(self) -> NotificationPipeline:
+        """Pipeline que resume as notificações e as grava na caixa de saída enquanto a exportação é lida."""
+        return NotificationPipeline(
+            summarize=self._summarize_actions,
+            render=self._render_notification,
+            save=lambda item, message: self._send_to_slack(
+                message, channel_override=item.channel, use_dynamic_webhook=True,
+                ticket_id=item.ticket_id, action_number=item.action_number, priority=item.priority,
+            ),
+            summary_workers=self.pipeline_summary_workers,
+            max_in_flight=self.pipeline_max_in_flight,
+            batch_max_items=self.summarizer.batch_max_items,
+            batch_linger=self.pipeline_batch_linger,
+        )
     
-    def _send_to_slack(self, message: str, channel_override: Optional[str] = None, use_dynamic_webhook: bool = False):
-        """Envia mensagem para o Slack, selecionando o webhook apropriado."""
-        if use_dynamic_webhook and self.slack_dynamic_webhook:
-            webhook_url = self.slack_dynamic_webhook
-            logging.info("Usando webhook dinâmico.")
-        else:
-            webhook_url = self.slack_webhook
-            logging.info("Usando webhook principal.")
-
-        if not webhook_url:
-            logging.error("Nenhum webhook do Slack apropriado foi configurado para esta ação.")
-            return
+    def _send_to_slack(self, message: str, channel_override: Optional[str] = None, use_dynamic_webhook: bool = False,
+                       ticket_id: str = "", action_number: int = 0, priority: int = PRIORITY_UPDATE) -> bool:
+        """Grava a mensagem na caixa de saída do Slack; o envio é feito por enviar_notificacoes.py.
 
+        (ticket_id, action_number, canal) identifica a notificação: gravar de novo a mesma
+        chave não gera um segundo envio. Retorna False apenas se a gravação falhou.
+        """
         target_channel = channel_override if channel_override else self.slack_default_channel
         if not target_channel:
             logging.error("Nenhum canal do Slack especificado para a notificação.")
-            return
+            return True
 
         try:
-            payload = {"channel": target_channel, "text": message, "username": "Monitor de Tickets", "icon_emoji": ":ticket:"}
-            response = requests.post(webhook_url, json=payload)
-            if response.status_code != 200:
-                logging.error(f"Erro ao enviar para Slack no canal {target_channel}: {response.text}")
+            webhook = WEBHOOK_DYNAMIC if use_dynamic_webhook else WEBHOOK_MAIN
+            if not self.outbox.enqueue(ticket_id, action_number, target_channel, message, priority, webhook):
+                logging.info(f"Notificação do ticket #{ticket_id} (ação {action_number}) já estava na caixa de saída")
+            return True
         except Exception as e:
-            logging.error(f"Erro ao enviar para Slack: {str(e)}")
-    
+            logging.error(f"Erro ao gravar notificação na caixa de saída: {str(e)}")
+            return False
+
+    def _submit_notification(self, pipeline: NotificationPipeline, item: PipelineItem):
+        """Entrega o ticket alterado ao pipeline, a menos que a notificação já esteja na caixa de saída.
+
+        Acontece quando uma rodada gravou a caixa e caiu antes de salvar a memória: a ação é
+        detectada de novo, mas não volta ao Gemini nem gera outra mensagem.
+        """
+        if item.channel and self.outbox.contains(item.ticket_id, item.action_number, item.channel):
+            logging.info(f"Notificação do ticket #{item.ticket_id} (ação {item.action_number}) já está na caixa de saída")
+            return
+        pipeline.submit(item)
+
+    def _use_lazy_reader(self, csv_file: str) -> bool:
+        """Decide se a exportação será lida pelo leitor mmap em vez do pandas."""
+        if self.csv_reader_mode in ("sempre", "true"):
+            return True
+        if self.csv_reader_mode in ("nunca", "false"):
+            return False
+        return Path(csv_file).stat().st_size >= self.csv_lazy_min_bytes
+
+    def _use_parallel_reader(self, csv_file: str) -> bool:
+        """Decide se a exportação será lida em paralelo por faixas de bytes."""
+        if self.csv_workers <= 1 or self.csv_parallel_mode in ("nunca", "false"):
+            return False
+        if self.csv_parallel_mode in ("sempre", "true"):
+            return True
+        return Path(csv_file).stat().st_size >= self.csv_parallel_min_bytes
+
+    @contextmanager
+    def _open_ticket_rows(self, csv_file: str) -> Iterator[Iterator[TicketRow]]:
+        """Abre a exportação e fornece as linhas de tickets.
+
+        Exportações grandes são lidas pelo LazyActionsReader: o texto da coluna "Ações" só é
+        materializado para os tickets cuja ação avançou, e o pico de memória passa a
+        depender do número de tickets alterados, não do histórico completo.
+        """
+        if self._use_parallel_reader(csv_file):
+            logging.info(f"Lendo CSV em paralelo com até {self.csv_workers} processos")
+            known_numbers = {
+                ticket_id: entry.get('last_action_number') for ticket_id, entry in self.memory.items()
+            }
+            # Tickets fechados fora da memória nunca precisam do texto da ação
+            parser = ParallelExportParser(csv_file, workers=self.csv_workers)
+            yield iter(parser.parse(known_numbers, closed_statuses=('Fechado', 'Resolvido')))
+            return
+
+        if self._use_lazy_reader(csv_file):
+            logging.info("Lendo CSV com o leitor mmap (coluna Ações sob demanda)")
+            with LazyActionsReader(csv_file) as reader:
+                yield iter(reader)
+            return
+
+        df = pd.read_csv(
+            csv_file, encoding='latin1', sep=';', on_bad_lines='warn',
+            engine='python', quoting=0, dtype={'Número': str, 'Status': str, 'Ações': str, 'Cliente (Pessoa)': str}
+        )
+        logging.info(f"CSV completo lido com {len(df)} tickets")
+        yield (
+            TicketRow(ticket.to_dict(), ticket['Ações'])
+            for _, ticket in df.iterrows()
+        )
+
     def _is_internal_author(self, action_text: str) -> bool:
         """Verifica se a ação é de um autor interno."""
-        if not action_text: return False
-        for autor in self.autores_internos:
-            if autor.strip() and autor.strip() in action_text:
-                logging.info(f"Ação é de autor interno: {autor}")
-                return True
+        autor = self.author_matcher.match(action_text)
+        if autor:
+            logging.info(f"Ação é de autor interno: {autor}")
+            return True
         return False
     
+    def _record_stage(self, stage: str, started: float, **details) -> float:
+        """Registra a duração da etapa no relatório e retorna o início da próxima."""
+        now = time.perf_counter()
+        self.report.record_stage(stage, "ok", now - started, **details)
+        return now
+
     def analyze_tickets(self, csv_file: str):
         """Analisa os tickets do arquivo CSV com lógica de verificação por número de ação."""
         try:
-            df = pd.read_csv(
-                csv_file, encoding='latin1', sep=';', on_bad_lines='warn',
-                engine='python', quoting=0, dtype={'Número': str, 'Status': str, 'Ações': str, 'Cliente (Pessoa)': str}
-            )
-            logging.info(f"CSV completo lido com {len(df)} tickets")
-
             new_memory = {}
+            tickets_read = 0
+            stage_started = time.perf_counter()
 
-            for _, ticket in df.iterrows():
-                ticket_id = str(ticket['Número'])
-                status = ticket['Status']
-                cliente_pessoa = ticket['Cliente (Pessoa)']
-                target_channel = self.channel_map.get(cliente_pessoa, self.slack_default_channel)
-                
-                # Extrai os detalhes da última ação
-                last_action_number, last_action = self._get_last_action_details(ticket['Ações'])
-                
-                if not last_action:
-                    continue
-
-                is_active_now = status not in ['Fechado', 'Resolvido']
-                
-                # Assume que não houve mudança até que se prove o contrário
-                has_changed = False
-                
-                # CASO A: Ticket já monitorado
-                if ticket_id in self.memory:
-                    previous_action_number = self.memory[ticket_id].get('last_action_number', 0)
-                    
-                    # NOVA LÓGICA DE VERIFICAÇÃO: O número da ação aumentou?
-                    if last_action_number > previous_action_number:
-                        has_changed = True
-                        was_active_before = self.memory[ticket_id].get('status', '') not in ['Fechado', 'Resolvido']
+            # Cada ticket alterado segue para resumo e para a caixa de saída assim que é
+            # detectado; a leitura só espera quando o teto de tickets em andamento é atingido.
+            # As linhas são abertas antes das threads do pipeline porque a leitura paralela
+            # cria processos
+            with self._open_ticket_rows(csv_file) as rows, self._notification_pipeline() as pipeline:
+                for ticket in rows:
+                    tickets_read += 1
+                    ticket_id = str(ticket['Número'])
+                    status = ticket['Status']
+                    cliente_pessoa = ticket['Cliente (Pessoa)']
+                    previous = self.memory.get(ticket_id)
+                    is_active_now = status not in ['Fechado', 'Resolvido']
 
-                        if not self._is_internal_author(last_action):
-                            formatted_text = self._format_with_gemini(last_action)
-                            
-                            if not is_active_now and was_active_before:
-                                title = f"✅ *Ticket #{ticket_id} foi Fechado/Resolvido*"
-                                logging.info(f"Ticket #{ticket_id} mudou para '{status}'. Notificando canal {target_channel}.")
-                            else:
-                                title = f"🔄 *Atualização no Ticket #{ticket_id}*"
-                                logging.info(f"Ticket #{ticket_id} (Status: {status}) tem nova ação. Notificando canal {target_channel}.")
-                            
-                            message = f"{title}\n*Responsável:* {ticket['Responsável']}\n*Cliente:* {ticket['Cliente (Pessoa)']}\n*Status:* {status}\n*Última Ação:*\n{formatted_text}"
-                            self._send_to_slack(message, channel_override=target_channel, use_dynamic_webhook=True)
-
-                # CASO B: Ticket novo para o sistema
-                else:
-                    if is_active_now:
+                    # Ticket fora da memória e já fechado: não há nada a notificar nem guardar.
+                    # Com lápide, a linha é descartada em O(1); sem ela, registra uma para
+                    # reconhecer uma reabertura futura
+                    if previous is None and not is_active_now:
+                        if ticket_id not in self.tombstones:
+                            closed_action_number = ticket.last_action_number()
+                            if closed_action_number:
+                                self.tombstones.add(ticket_id, closed_action_number)
+                        continue
+
+                    # Número da última ação, sem materializar o texto do histórico
+                    last_action_number = ticket.last_action_number()
+
+                    if not last_action_number:
+                        continue
+
+                    # Sem ação nova: reaproveita o texto guardado na memória
+                    if previous is not None and last_action_number == previous.get('last_action_number'):
+                        last_action = previous.get('last_action')
+                        last_action_at = previous.get('last_action_at') or action_timestamp(last_action)
+                    else:
+                        _, last_action = ticket.last_action_details()
+                        last_action_at = action_timestamp(last_action)
+
+                    # SLA: só os cabeçalhos das ações novas desde a última rodada (ou desde o
+                    # fechamento, se o ticket foi reaberto) são lidos
+                    sla_state = previous.get('sla') if previous is not None else None
+                    if previous is not None:
+                        seen_action_number = previous.get('last_action_number', 0)
+                    else:
+                        tombstone = self.tombstones.get(ticket_id)
+                        seen_action_number = tombstone[0] if tombstone else 0
+                    if last_action_number > seen_action_number:
+                        sla_state = self.sla.update(
+                            cliente_pessoa if isinstance(cliente_pessoa, str) else None,
+                            sla_state, ticket.action_headers(seen_action_number)
+                        )
+
+                    target_channel = self.channel_router.route(ticket_id, cliente_pessoa, ticket['Responsável'])
+
+                    # Assume que não houve mudança até que se prove o contrário
+                    has_changed = False
+
+                    # CASO A: Ticket já monitorado
+                    if previous is not None:
+                        previous_action_number = previous.get('last_action_number', 0)
+
+                        # NOVA LÓGICA DE VERIFICAÇÃO: O número da ação aumentou?
+                        if last_action_number > previous_action_number:
+                            has_changed = True
+                            was_active_before = previous.get('status', '') not in ['Fechado', 'Resolvido']
+
+                            if not self._is_internal_author(last_action):
+                                if not is_active_now and was_active_before:
+                                    title = f"✅ *Ticket #{ticket_id} foi Fechado/Resolvido*"
+                                    priority = PRIORITY_CLOSED
+                                    logging.info(f"Ticket #{ticket_id} mudou para '{status}'. Notificando canal {target_channel}.")
+                                else:
+                                    title = f"🔄 *Atualização no Ticket #{ticket_id}*"
+                                    priority = PRIORITY_UPDATE
+                                    logging.info(f"Ticket #{ticket_id} (Status: {status}) tem nova ação. Notificando canal {target_channel}.")
+
+                                self._submit_notification(pipeline, PipelineItem(ticket_id, target_channel, last_action, priority, {
+                                    'title': title, 'responsavel': ticket['Responsável'], 'cliente': cliente_pessoa, 'status': status,
+                                }, action_number=last_action_number))
+
+                        if not is_active_now:
+                            self.tombstones.add(ticket_id, last_action_number)
+
+                    # CASO C: Ticket fechado anteriormente que voltou a ficar ativo
+                    elif ticket_id in self.tombstones:
+                        closed_action_number, _ = self.tombstones.get(ticket_id)
+                        self.tombstones.discard(ticket_id)
+
+                        if last_action_number > closed_action_number and not self._is_internal_author(last_action):
+                            has_changed = True
+                            logging.info(f"Ticket #{ticket_id} foi reaberto. Notificando canal {target_channel}.")
+                            self._submit_notification(pipeline, PipelineItem(ticket_id, target_channel, last_action, PRIORITY_NEW, {
+                                'title': f"🔁 *Ticket #{ticket_id} foi Reaberto*",
+                                'responsavel': ticket['Responsável'], 'cliente': cliente_pessoa, 'status': status,
+                            }, action_number=last_action_number))
+                        else:
+                            logging.info(f"Ticket #{ticket_id} reaberto sem nova ação externa; sem notificação.")
+
+                    # CASO B: Ticket novo para o sistema (sempre ativo, pelo filtro acima)
+                    else:
                         has_changed = True
                         logging.info(f"Novo ticket ativo #{ticket_id} encontrado. Notificando canal {target_channel}.")
-                        
+
                         if not self._is_internal_author(last_action):
-                            formatted_text = self._format_with_gemini(last_action)
-                            message = f"✨ *Novo Ticket #{ticket_id}*\n*Responsável:* {ticket['Responsável']}\n*Cliente:* {ticket['Cliente (Pessoa)']}\n*Status:* {status}\n*Última Ação:*\n{formatted_text}"
-                            self._send_to_slack(message, channel_override=target_channel, use_dynamic_webhook=True)
-                
-                # Adiciona à nova memória APENAS se estiver ativo
-                if is_active_now:
-                    new_memory[ticket_id] = {
-                        'last_action_number': last_action_number, # Salva o número da ação
-                        'status': status,
-                        'last_action': last_action
-                    }
-
-            # ATUALIZAÇÃO FINAL DA MEMÓRIA
-            if self.memory != new_memory:
+                            self._submit_notification(pipeline, PipelineItem(ticket_id, target_channel, last_action, PRIORITY_NEW, {
+                                'title': f"✨ *Novo Ticket #{ticket_id}*",
+                                'responsavel': ticket['Responsável'], 'cliente': cliente_pessoa, 'status': status,
+                            }, action_number=last_action_number))
+
+                    # Adiciona à nova memória APENAS se estiver ativo
+                    if is_active_now:
+                        new_memory[ticket_id] = {
+                            'last_action_number': last_action_number, # Salva o número da ação
+                            'status': status,
+                            # Campos vazios do pandas chegam como NaN, que não é JSON válido
+                            'cliente': cliente_pessoa if isinstance(cliente_pessoa, str) else None,
+                            'responsavel': ticket['Responsável'] if isinstance(ticket['Responsável'], str) else None,
+                            'last_action_at': last_action_at,
+                            'sla': sla_state,
+                            'last_action': last_action
+                        }
+
+                stage_started = self._record_stage("leitura", stage_started, tickets=tickets_read, alterados=pipeline.submitted)
+
+            # Ao sair do bloco, o pipeline termina os resumos e gravações ainda em andamento
+            pipeline_stats = pipeline.stats()
+            if pipeline.failed:
+                # Sem todas as notificações na caixa de saída, a memória não pode avançar
+                raise RuntimeError(f"{pipeline.failed} notificações não foram gravadas na caixa de saída")
+            stage_started = self._record_stage("notificacao", stage_started, mensagens=pipeline.saved)
+            self.report.set("tickets_lidos", tickets_read)
+            self.report.set("pipeline", pipeline_stats)
+            self.report.set("caixa_saida", self.outbox.counts())
+            self.report.set("limpeza", self.action_cleaner.report())
+            self.report.set("llm", self.llm_profiler.report())
+
+            self._confirm_export_probe()
+            self.tombstones.save()
+            self.sla.save(new_memory)
+            self.llm_profiler.save()
+
+            # ATUALIZAÇÃO FINAL DA MEMÓRIA (e dos demais arquivos de estado, mesmo sem mudança nela)
+            memory_changed = self.memory != new_memory
+            if memory_changed:
                 self.memory = new_memory
-                self._save_memory()
+            self._save_memory(memory_changed)
+            if memory_changed:
                 logging.info(f"Memória atualizada com {len(new_memory)} tickets ativos")
             else:
                 logging.info("Nenhuma mudança estrutural na memória de tickets ativos detectada.")
+            self._record_stage("estado", stage_started)
 
             return True
 
@@ -254,9 +539,24 @@ class TicketAnalyzer:
 def main():
     """Função principal."""
     try:
-        analyzer = TicketAnalyzer()
-        analyzer.analyze_tickets("downloads/file.csv")
-        logging.info("Análise de tickets concluída com sucesso")
+        # Mesma trava da automação: o analisador assume a trava repassada pelo seu ciclo
+        lock = RunLock()
+        if not lock.acquire():
+            logging.warning("Outra rodada em andamento; análise ignorada")
+            return
+
+        try:
+            if Path("downloads/.sem_exportacao").exists():
+                logging.info("Lista de tickets sem mudanças nesta rodada; análise ignorada")
+                return
+
+            analyzer = TicketAnalyzer()
+            analyzer.analyze_tickets("downloads/file.csv")
+            analyzer.report.set("tempo_restante_s", round(analyzer.deadline.remaining(), 1))
+            analyzer.report.save()
+            logging.info("Análise de tickets concluída com sucesso")
+        finally:
+            lock.release()
     except Exception as e:
         logging.error(f"Erro na execução: {str(e)}", exc_info=True)
         raise
@@ -8,10 +8,11 @@ import logging
 import pandas as pd
 import json
 import requests
+import hashlib
 import subprocess
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Callable
 from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -27,30 +28,19 @@ from selenium.common.exceptions import (
     ElementClickInterceptedException
 )
 from config import config
+from controle_execucao import RunDeadline, RunReport, RunLock
+from registro_logs import ScreenshotStore, parse_size, setup_async_logging
 
 # Carrega as variáveis de ambiente
 load_dotenv()
 
 # Configuração de logging
 def setup_logging() -> logging.Logger:
-    """Configura o sistema de logging."""
-    log_dir = config.paths.log_dir
-    log_dir.mkdir(parents=True, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = log_dir / f"automacao_{timestamp}.log"
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+    """Configura o sistema de logging (assíncrono, com rotação e compactação)."""
+    setup_async_logging("automacao.log")
     
     logger = logging.getLogger(__name__)
-    logger.info(f"Log iniciado: {log_file}")
+    logger.info(f"Log iniciado: {config.paths.log_dir / 'automacao.log'}")
     return logger
 
 # Configurações
@@ -69,14 +59,54 @@ class Config:
         self.page_load_timeout = 30
         self.element_wait_timeout = 20
         self.download_wait_timeout = 60
+
+        # Novas tentativas por etapa (com backoff exponencial a partir de retry_delay)
+        self.retry_attempts = max(1, config.selenium.retry_attempts)
+        self.retry_delay = config.selenium.retry_delay
         
         # Diretórios
         self.download_dir = Path("downloads").resolve()
         self.screenshot_dir = Path("screenshots").resolve()
+        self.screenshot_max_bytes = parse_size(config.app.screenshot_max_size)
+        # Marca uma rodada em que a lista não mudou e a exportação foi pulada
+        self.skip_marker = self.download_dir / ".sem_exportacao"
         
         # URLs
         self.login_url = "https://atendimento.migrate.com.br/Ticket"
-    
+
+        # Plano de shards da exportação
+        self.export_shards = self._load_export_shards()
+        self.full_export_interval_minutes = int(os.getenv("FULL_EXPORT_INTERVAL_MINUTES", "360"))
+        self.export_state_file = Path("data/export_state.json").resolve()
+        # Indicador barato de mudança: a lista de tickets ordenada pela última atualização (mais
+        # recente primeiro), o total de tickets dela e a primeira linha. Sem a URL ordenada ou
+        # sem o total, o indicador não cobre a lista inteira e a exportação nunca é pulada
+        self.probe_url = os.getenv("TICKET_LIST_PROBE_URL", "")
+        self.probe_count_selector = os.getenv("TICKET_LIST_COUNT_SELECTOR", "")
+        self.probe_selector = os.getenv("TICKET_LIST_PROBE_SELECTOR", "table tbody tr:first-child")
+
+    def _load_export_shards(self) -> List[Dict[str, str]]:
+        """Carrega o plano de shards a partir da variável de ambiente EXPORT_SHARDS.
+
+        Formato esperado (JSON): [{"nome": "abertos", "url": "<url da lista com filtro>", "plano": "rapido"}, ...]
+        O plano "rapido" reúne os filtros de tickets ativos e fechamentos recentes; o plano
+        "completo" (opcional) divide a reconciliação completa, por exemplo, em faixas de data.
+        """
+        shards_json = os.getenv("EXPORT_SHARDS", "[]")
+        try:
+            shards = json.loads(shards_json)
+        except json.JSONDecodeError:
+            logging.error("Erro ao decodificar EXPORT_SHARDS. Verifique o formato JSON.")
+            return []
+
+        valid_shards = []
+        for shard in shards if isinstance(shards, list) else []:
+            if isinstance(shard, dict) and shard.get("url"):
+                shard.setdefault("nome", f"shard_{len(valid_shards) + 1}")
+                shard.setdefault("plano", "rapido")
+                valid_shards.append(shard)
+        return valid_shards
+
     def validate(self) -> bool:
         """Valida se todas as configurações necessárias estão presentes."""
         required_vars = {
@@ -168,44 +198,60 @@ class SeleniumAutomation:
         self.driver: Optional[webdriver.Chrome] = None
         self.wait = None
         self.analyzer = TicketAnalyzer(self.config.download_dir / "file.csv")
+        self.deadline = RunDeadline.from_env()
+        self.report = RunReport("automacao")
+        self.current_probe: Optional[str] = None
+        self.screenshots = ScreenshotStore(self.config.screenshot_dir, self.config.screenshot_max_bytes)
     
     def setup_chrome_options(self) -> Options:
-        """Configura as opções do Chrome."""
+        """Monta o perfil do Chrome a partir do ConfigManager."""
         chrome_options = Options()
+        profile = config.get_chrome_options()
         
         # Configurações básicas
-        if not self.config.debug_mode:
+        if profile.pop("headless") and not self.config.debug_mode:
             chrome_options.add_argument("--headless=new")
         
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-popup-blocking")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--disable-infobars")
-        chrome_options.add_argument("--disable-web-security")
-        chrome_options.add_argument("--allow-running-insecure-content")
-        chrome_options.add_argument("--disable-features=VizDisplayCompositor")
+        chrome_options.page_load_strategy = profile.pop("page_load_strategy")
+        
+        user_data_dir = profile.pop("user_data_dir")
+        if user_data_dir:
+            profile_path = Path(user_data_dir)
+            profile_path.mkdir(parents=True, exist_ok=True)
+            # Travas deixadas por um Chrome encerrado à força impedem a reutilização do perfil
+            for lock_file in profile_path.glob("Singleton*"):
+                lock_file.unlink(missing_ok=True)
+            chrome_options.add_argument(f"--user-data-dir={profile_path}")
+        
+        # Demais opções: True vira uma flag ("--no-sandbox"), texto vira "--flag=valor"
+        for option, value in profile.items():
+            flag = "--" + option.replace("_", "-")
+            if value is True:
+                chrome_options.add_argument(flag)
+            elif value:
+                chrome_options.add_argument(f"{flag}={value}")
         
         # Remove indicadores de automação
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option("useAutomationExtension", False)
         
-        # Configurações de download
-        prefs = {
-            "download.default_directory": str(self.config.download_dir),
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True,
-            "profile.default_content_settings.popups": 0,
-            "profile.default_content_setting_values.notifications": 2,
-            "profile.managed_default_content_settings.images": 2  # Não carrega imagens para economizar banda
-        }
+        # Configurações de download (não carrega imagens para economizar banda)
+        prefs = config.get_download_preferences()
+        prefs["download.default_directory"] = str(self.config.download_dir)
         chrome_options.add_experimental_option("prefs", prefs)
         
         return chrome_options
+
+    def _apply_network_blocking(self):
+        """Bloqueia fontes, analytics e domínios de terceiros na aba atual via DevTools.
+
+        O bloqueio vale por aba, então precisa ser reaplicado em cada aba nova.
+        """
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": config.get_blocked_url_patterns()})
+        except WebDriverException as e:
+            self.logger.warning(f"Não foi possível aplicar o bloqueio de requisições: {str(e)}")
     
     def initialize_driver(self) -> bool:
         """Inicializa o driver do Chrome."""
@@ -226,6 +272,7 @@ class SeleniumAutomation:
             
             # Remove propriedades que indicam automação
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            self._apply_network_blocking()
             
             self.wait = WebDriverWait(self.driver, self.config.element_wait_timeout)
             
@@ -245,6 +292,7 @@ class SeleniumAutomation:
             if self.driver:
                 self.driver.save_screenshot(str(screenshot_path))
                 self.logger.info(f"Screenshot salvo: {screenshot_path}")
+                self.screenshots.enforce()
             
             return screenshot_path
         except Exception as e:
@@ -289,6 +337,13 @@ class SeleniumAutomation:
             
             time.sleep(3)  # Aguarda estabilização
             
+            # Com o perfil persistente, a sessão pode continuar válida (ex.: ao repetir uma etapa
+            # na mesma rodada); entre rodadas os cookies não são guardados no cache do workflow
+            if ("login" not in self.driver.current_url.lower()
+                    and not self.driver.find_elements(By.CSS_SELECTOR, "input[type='password']")):
+                self.logger.info("Sessão reaproveitada do perfil do Chrome; login dispensado")
+                return True
+            
             # Preenche email
             self.logger.info("Preenchendo campo de e-mail...")
             email_input = self.wait.until(
@@ -350,135 +405,157 @@ class SeleniumAutomation:
             return False
     
     def export_to_csv(self) -> bool:
-        """Exporta os dados para CSV."""
+        """Exporta os dados para CSV, em paralelo por shards quando houver plano configurado."""
+        plan_name, shards = self._select_shard_plan()
+        if not shards:
+            if not self._export_single():
+                return False
+            self._record_export_state(plan_name)
+            return True
+
+        if not self._export_sharded(plan_name, shards):
+            return False
+        self._record_export_state(plan_name)
+        return True
+
+    def _export_single(self) -> bool:
+        """Exporta a lista completa de tickets em uma única exportação."""
         try:
             self.logger.info("Iniciando processo de exportação...")
             
-            # Procura e clica no botão OPÇÕES
-            self.logger.info("Procurando botão OPÇÕES...")
-            opcoes_selectors = [
-                "//span[contains(@class, 'button-text') and text()='OPÇÕES']",
-                "//button[contains(text(), 'OPÇÕES')]",
-                "//a[contains(text(), 'OPÇÕES')]",
-                ".btn-options",
-                "#options-button"
-            ]
-            
-            opcoes_button = None
-            for selector in opcoes_selectors:
-                try:
-                    if selector.startswith("//"):
-                        opcoes_button = self.wait.until(
-                            EC.element_to_be_clickable((By.XPATH, selector))
-                        )
-                    else:
-                        opcoes_button = self.wait.until(
-                            EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                        )
-                    break
-                except TimeoutException:
-                    continue
+            if not self._trigger_export():
+                return False
             
-            if not opcoes_button:
-                raise Exception("Botão OPÇÕES não encontrado")
+            self.logger.info("Aguardando download...")
+            return self.wait_for_download()
             
-            if not self.safe_click(opcoes_button, "botão OPÇÕES"):
-                return False
+        except Exception as e:
+            self.logger.error(f"Erro durante exportação: {str(e)}")
+            self.take_screenshot("export_error")
+            return False
+
+    def _trigger_export(self) -> bool:
+        """Dispara a exportação CSV na aba atual, sem aguardar o download."""
+        # Procura e clica no botão OPÇÕES
+        self.logger.info("Procurando botão OPÇÕES...")
+        opcoes_selectors = [
+            "//span[contains(@class, 'button-text') and text()='OPÇÕES']",
+            "//button[contains(text(), 'OPÇÕES')]",
+            "//a[contains(text(), 'OPÇÕES')]",
+            ".btn-options",
+            "#options-button"
+        ]
+        
+        opcoes_button = None
+        for selector in opcoes_selectors:
+            try:
+                if selector.startswith("//"):
+                    opcoes_button = self.wait.until(
+                        EC.element_to_be_clickable((By.XPATH, selector))
+                    )
+                else:
+                    opcoes_button = self.wait.until(
+                        EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                    )
+                break
+            except TimeoutException:
+                continue
+        
+        if not opcoes_button:
+            raise Exception("Botão OPÇÕES não encontrado")
+        
+        if not self.safe_click(opcoes_button, "botão OPÇÕES"):
+            return False
+        
+        time.sleep(2)
+        
+        # Procura link de exportar para CSV
+        self.logger.info("Procurando link de exportação...")
+        export_selectors = [
+            "a.btnExport.btnExportToCsv",
+            "a[href*='csv']",
+            "//a[contains(text(), 'CSV')]",
+            ".export-csv",
+            "#export-csv"
+        ]
+        
+        export_link = None
+        for selector in export_selectors:
+            try:
+                if selector.startswith("//"):
+                    export_link = self.wait.until(
+                        EC.element_to_be_clickable((By.XPATH, selector))
+                    )
+                else:
+                    export_link = self.wait.until(
+                        EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                    )
+                break
+            except TimeoutException:
+                continue
+        
+        if not export_link:
+            raise Exception("Link de exportação não encontrado")
+        
+        if not self.safe_click(export_link, "link de exportação"):
+            return False
+        
+        time.sleep(3)
+        
+        # Configura opções de exportação se disponível
+        try:
+            self.logger.info("Configurando opções de exportação...")
+            select_element = self.wait.until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "select.col-xs-12.input-mv-new.md-confirm-options, select[name*='export'], select.export-options"))
+            )
             
-            time.sleep(2)
+            select = Select(select_element)
+            # Tenta selecionar a opção "Todas as ações na mesma coluna" (valor 3)
+            try:
+                select.select_by_value("3")
+                self.logger.info("Opção de exportação configurada")
+            except:
+                self.logger.warning("Não foi possível configurar opção específica, usando padrão")
             
-            # Procura link de exportar para CSV
-            self.logger.info("Procurando link de exportação...")
-            export_selectors = [
-                "a.btnExport.btnExportToCsv",
-                "a[href*='csv']",
-                "//a[contains(text(), 'CSV')]",
-                ".export-csv",
-                "#export-csv"
+            # Clica no botão OK/Confirmar
+            ok_selectors = [
+                "button.btn-mv.btn-mv-confirm.md-confirm-action.trigger-service-nps[data-value='ok']",
+                "button[data-value='ok']",
+                "//button[text()='OK']",
+                ".btn-confirm",
+                "#confirm-export"
             ]
             
-            export_link = None
-            for selector in export_selectors:
+            ok_button = None
+            for selector in ok_selectors:
                 try:
                     if selector.startswith("//"):
-                        export_link = self.wait.until(
+                        ok_button = self.wait.until(
                             EC.element_to_be_clickable((By.XPATH, selector))
                         )
                     else:
-                        export_link = self.wait.until(
+                        ok_button = self.wait.until(
                             EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
                         )
                     break
                 except TimeoutException:
                     continue
             
-            if not export_link:
-                raise Exception("Link de exportação não encontrado")
-            
-            if not self.safe_click(export_link, "link de exportação"):
-                return False
-            
-            time.sleep(3)
+            if ok_button:
+                self.safe_click(ok_button, "botão OK")
             
-            # Configura opções de exportação se disponível
-            try:
-                self.logger.info("Configurando opções de exportação...")
-                select_element = self.wait.until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "select.col-xs-12.input-mv-new.md-confirm-options, select[name*='export'], select.export-options"))
-                )
-                
-                select = Select(select_element)
-                # Tenta selecionar a opção "Todas as ações na mesma coluna" (valor 3)
-                try:
-                    select.select_by_value("3")
-                    self.logger.info("Opção de exportação configurada")
-                except:
-                    self.logger.warning("Não foi possível configurar opção específica, usando padrão")
-                
-                # Clica no botão OK/Confirmar
-                ok_selectors = [
-                    "button.btn-mv.btn-mv-confirm.md-confirm-action.trigger-service-nps[data-value='ok']",
-                    "button[data-value='ok']",
-                    "//button[text()='OK']",
-                    ".btn-confirm",
-                    "#confirm-export"
-                ]
-                
-                ok_button = None
-                for selector in ok_selectors:
-                    try:
-                        if selector.startswith("//"):
-                            ok_button = self.wait.until(
-                                EC.element_to_be_clickable((By.XPATH, selector))
-                            )
-                        else:
-                            ok_button = self.wait.until(
-                                EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                            )
-                        break
-                    except TimeoutException:
-                        continue
-                
-                if ok_button:
-                    self.safe_click(ok_button, "botão OK")
-                
-            except TimeoutException:
-                self.logger.info("Nenhuma configuração adicional necessária")
-            
-            self.logger.info("Aguardando download...")
-            return self.wait_for_download()
-            
-        except Exception as e:
-            self.logger.error(f"Erro durante exportação: {str(e)}")
-            self.take_screenshot("export_error")
-            return False
+        except TimeoutException:
+            self.logger.info("Nenhuma configuração adicional necessária")
+        
+        return True
     
     def wait_for_download(self) -> bool:
         """Aguarda o download ser concluído."""
         try:
             start_time = time.time()
+            timeout = min(self.config.download_wait_timeout, self.deadline.remaining())
             
-            while time.time() - start_time < self.config.download_wait_timeout:
+            while time.time() - start_time < timeout:
                 # Verifica arquivos CSV no diretório
                 csv_files = list(self.config.download_dir.glob("*.csv"))
                 
@@ -493,11 +570,6 @@ class SeleniumAutomation:
                         # Verifica se o arquivo tem tamanho razoável
                         if latest_file.stat().st_size > 1024:  # Maior que 1KB
                             self.logger.info(f"Download concluído: {latest_file.name} ({latest_file.stat().st_size} bytes)")
-                            
-                            # Analisa o arquivo
-                            if not self.analyzer.analyze_tickets():
-                                raise Exception("Falha na análise dos tickets")
-                            
                             return True
                 
                 time.sleep(2)
@@ -508,7 +580,186 @@ class SeleniumAutomation:
         except Exception as e:
             self.logger.error(f"Erro aguardando download: {str(e)}")
             return False
-    
+
+    def _load_export_state(self) -> Dict[str, Any]:
+        """Carrega o estado da última exportação (data da última reconciliação completa)."""
+        try:
+            if self.config.export_state_file.exists():
+                with open(self.config.export_state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Erro ao carregar estado da exportação: {str(e)}")
+        return {}
+
+    def _record_export_state(self, plan_name: str):
+        """Registra o plano executado e, se completo, a data da reconciliação."""
+        state = self._load_export_state()
+        now = datetime.now().isoformat(timespec="seconds")
+        state["last_plan"] = plan_name
+        state["last_export"] = now
+        # Só vira "last_probe" quando o analisador confirmar que processou esta exportação
+        state["pending_probe"] = self.current_probe
+        if plan_name == "completo":
+            state["last_full_export"] = now
+
+        try:
+            self.config.export_state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.config.export_state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar estado da exportação: {str(e)}")
+
+    def _full_export_due(self) -> bool:
+        """Indica se já passou o intervalo desde a última reconciliação completa."""
+        last_full = self._load_export_state().get("last_full_export")
+        if not last_full:
+            return True
+        elapsed = datetime.now() - datetime.fromisoformat(last_full)
+        return elapsed.total_seconds() >= self.config.full_export_interval_minutes * 60
+
+    def _probe_ticket_list(self) -> Optional[str]:
+        """Lê um indicador barato de mudança que cobre a lista inteira de tickets.
+
+        Com a lista ordenada pela última atualização, a primeira linha traz a atualização
+        mais recente de qualquer ticket, inclusive os fora da primeira página; o total pega
+        tickets que entraram ou saíram da lista. Retorna None (lista tratada como alterada)
+        quando a URL ordenada ou o seletor do total não estão configurados, ou quando um
+        dos dois valores não pôde ser lido.
+        """
+        if not self.config.probe_url or not self.config.probe_count_selector:
+            self.logger.info("Indicador de mudança sem lista ordenada ou total configurado; exportação sempre executada")
+            return None
+        try:
+            self.driver.get(self.config.probe_url)
+            self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.config.probe_count_selector)))
+            total, newest = self.driver.execute_script(
+                "return arguments.map(s => { const el = document.querySelector(s); return el ? el.innerText : ''; });",
+                self.config.probe_count_selector, self.config.probe_selector
+            )
+            total = " ".join((total or "").split())
+            newest = " ".join((newest or "").split())
+            if not total or not newest:
+                self.logger.warning("Indicador de mudança incompleto (total ou primeira linha vazios); lista tratada como alterada")
+                return None
+            return hashlib.sha256(f"{total}\n{newest}".encode('utf-8')).hexdigest()
+        except Exception as e:
+            self.logger.warning(f"Não foi possível ler o indicador de mudança da lista: {str(e)}")
+            return None
+        finally:
+            # A exportação parte da lista padrão, aberta após o login
+            try:
+                self.driver.get(self.config.login_url)
+            except Exception as e:
+                self.logger.warning(f"Não foi possível voltar à lista de tickets: {str(e)}")
+
+    def _ticket_list_unchanged(self) -> bool:
+        """Compara o indicador atual com o da última exportação bem-sucedida."""
+        self.current_probe = self._probe_ticket_list()
+        if not self.current_probe or self._full_export_due():
+            return False
+        return self.current_probe == self._load_export_state().get("last_probe")
+
+    def _select_shard_plan(self) -> Tuple[str, List[Dict[str, str]]]:
+        """Escolhe entre o caminho rápido (somente ativos) e a reconciliação completa."""
+        fast_shards = [s for s in self.config.export_shards if s["plano"] == "rapido"]
+        full_shards = [s for s in self.config.export_shards if s["plano"] == "completo"]
+
+        if not fast_shards:
+            return "completo", full_shards
+
+        if not self._full_export_due():
+            self.logger.info(f"Usando caminho rápido com {len(fast_shards)} shards")
+            return "rapido", fast_shards
+
+        if self.deadline.is_low():
+            self.report.record_degradation("exportacao", "reconciliação completa adiada; usando o caminho rápido")
+            return "rapido", fast_shards
+
+        self.logger.info("Reconciliação completa necessária nesta execução")
+        return "completo", full_shards
+
+    def _export_sharded(self, plan_name: str, shards: List[Dict[str, str]]) -> bool:
+        """Dispara uma exportação por shard, cada uma em sua aba, e junta os resultados."""
+        original_handle = self.driver.current_window_handle
+        existing_files = set(self.config.download_dir.glob("*.csv"))
+
+        try:
+            self.logger.info(f"Iniciando exportação '{plan_name}' em {len(shards)} shards...")
+
+            # Os downloads correm em paralelo no servidor: cada aba dispara o seu e segue para a próxima
+            for shard in shards:
+                self.driver.switch_to.new_window('tab')
+                self._apply_network_blocking()
+                self.driver.get(shard["url"])
+                self.wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+                self.logger.info(f"Disparando exportação do shard '{shard['nome']}'")
+
+                if not self._trigger_export():
+                    raise Exception(f"Falha ao disparar exportação do shard '{shard['nome']}'")
+
+            shard_files = self._wait_for_new_downloads(existing_files, len(shards))
+            if not shard_files:
+                return False
+
+            self._merge_shard_exports(shard_files, self.config.download_dir / "file.csv")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Erro durante exportação por shards: {str(e)}")
+            self.take_screenshot("export_shard_error")
+            return False
+
+        finally:
+            for handle in self.driver.window_handles:
+                if handle != original_handle:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+            self.driver.switch_to.window(original_handle)
+
+    def _wait_for_new_downloads(self, existing_files: set, expected: int) -> List[Path]:
+        """Aguarda até que `expected` novos arquivos CSV terminem de baixar."""
+        start_time = time.time()
+        timeout = min(self.config.download_wait_timeout, self.deadline.remaining())
+
+        while time.time() - start_time < timeout:
+            new_files = [f for f in self.config.download_dir.glob("*.csv") if f not in existing_files]
+            temp_files = list(self.config.download_dir.glob("*.crdownload"))
+
+            if len(new_files) >= expected and not temp_files:
+                self.logger.info(f"Downloads dos shards concluídos: {[f.name for f in new_files]}")
+                return new_files
+
+            time.sleep(2)
+
+        self.logger.error(f"Timeout aguardando downloads dos shards ({expected} esperados)")
+        return []
+
+    def _merge_shard_exports(self, shard_files: List[Path], output_file: Path):
+        """Junta os CSVs dos shards, removendo tickets duplicados pelo `Número`."""
+        frames = [
+            pd.read_csv(
+                shard_file, encoding='latin1', sep=';', on_bad_lines='warn',
+                engine='python', quoting=0, dtype=str
+            )
+            for shard_file in shard_files
+        ]
+        merged = pd.concat(frames, ignore_index=True)
+
+        # Um ticket pode aparecer em mais de um shard (ex.: fechado no meio do dia);
+        # mantém a linha com o histórico de ações mais longo, que é a mais recente
+        merged = (
+            merged.assign(_tamanho_acoes=merged['Ações'].fillna('').str.len())
+            .sort_values('_tamanho_acoes', kind='stable')
+            .drop_duplicates(subset='Número', keep='last')
+            .drop(columns='_tamanho_acoes')
+        )
+
+        for shard_file in shard_files:
+            shard_file.unlink()
+
+        merged.to_csv(output_file, sep=';', encoding='latin1', index=False)
+        self.logger.info(f"{len(merged)} tickets únicos consolidados de {len(shard_files)} shards em {output_file.name}")
+
     def compare_ticket_data(self) -> Tuple[bool, Dict[str, Any]]:
         """Compara os dados dos tickets com a última execução."""
         memory_file = Path("data/ticket_memory.json")
@@ -636,14 +887,13 @@ class SeleniumAutomation:
             return False
     
     def commit_changes(self) -> bool:
-        """Faz commit das alterações no arquivo de memória e logs."""
+        """Faz commit das alterações no arquivo de memória (os logs ficam fora do repositório)."""
         try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             # Comandos git para adicionar e commitar as alterações
             commands = [
                 "git add data/ticket_memory.json",
-                "git add logs/*",
                 f'git commit -m "📊 Atualização de tickets - {timestamp}"'
             ]
             
@@ -666,23 +916,115 @@ class SeleniumAutomation:
             self.logger.error(f"Erro ao fazer commit das alterações: {str(e)}")
             return False
 
+    def _session_alive(self) -> bool:
+        """Verifica se o driver ainda responde."""
+        try:
+            return self.driver is not None and bool(self.driver.window_handles)
+        except WebDriverException:
+            return False
+
+    def _recover_session(self, stage: str) -> bool:
+        """Prepara uma nova tentativa da etapa reaproveitando o driver e a sessão quando possível.
+
+        Se o navegador caiu, reinicia o driver e refaz o login; se a sessão expirou, refaz só
+        o login; caso contrário, apenas volta para a lista de tickets.
+        """
+        # Downloads interrompidos atrapalhariam a detecção do próximo arquivo
+        for partial_file in self.config.download_dir.glob("*.crdownload"):
+            partial_file.unlink(missing_ok=True)
+
+        if stage == "login":
+            return self._session_alive() or self.initialize_driver()
+
+        if not self._session_alive():
+            self.logger.warning("Driver Chrome não responde; reiniciando navegador e sessão")
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except WebDriverException:
+                    pass
+            return self.initialize_driver() and self.login()
+
+        try:
+            self.driver.get(self.config.login_url)
+            self.wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        except WebDriverException as e:
+            self.logger.warning(f"Erro ao voltar para a lista de tickets: {str(e)}")
+            return False
+
+        if "login" in self.driver.current_url.lower():
+            self.logger.info("Sessão expirada; refazendo login")
+            return self.login()
+        return True
+
+    def _run_stage(self, stage: str, action: Callable[[], bool], recover: bool = True) -> bool:
+        """Executa uma etapa da rodada com novas tentativas e backoff exponencial.
+
+        Cada etapa concluída é um ponto de controle: uma falha repete apenas a etapa atual,
+        sem recomeçar a rodada. Etapa, status e número de tentativas vão para o relatório.
+        """
+        attempts = self.config.retry_attempts
+        started = time.time()
+
+        for attempt in range(1, attempts + 1):
+            try:
+                success = action()
+            except Exception as e:
+                self.logger.error(f"Erro na etapa '{stage}' (tentativa {attempt}/{attempts}): {str(e)}")
+                success = False
+
+            if success:
+                self.report.record_stage(stage, "ok", time.time() - started, tentativas=attempt)
+                return True
+
+            if attempt == attempts:
+                break
+
+            delay = self.config.retry_delay * 2 ** (attempt - 1)
+            if self.deadline.is_low() or delay >= self.deadline.remaining():
+                self.report.record_degradation(stage, "novas tentativas canceladas por falta de tempo")
+                break
+
+            self.logger.warning(f"Etapa '{stage}' falhou (tentativa {attempt}/{attempts}); nova tentativa em {delay}s")
+            time.sleep(delay)
+
+            if recover and not self._recover_session(stage):
+                self.logger.error(f"Não foi possível recuperar a sessão para repetir a etapa '{stage}'")
+                break
+
+        self.report.record_stage(stage, "falhou", time.time() - started, tentativas=attempt)
+        self.report.set("etapa_com_falha", stage)
+        self.take_screenshot(f"{stage}_falhou")
+        return False
+
     def run(self) -> bool:
         """Executa o processo completo de automação."""
         try:
             # Valida configurações
             self.config.validate()
+            self.config.skip_marker.unlink(missing_ok=True)
             
             # Inicializa o driver
-            if not self.initialize_driver():
+            if not self._run_stage("inicializacao", self.initialize_driver, recover=False):
                 return False
             
             try:
                 # Realiza login
-                if not self.login():
+                if not self._run_stage("login", self.login):
                     return False
+
+                # Nada mudou na lista desde a última rodada: pula exportação, análise e diff
+                if self._ticket_list_unchanged():
+                    self.logger.info("Lista de tickets sem mudanças desde a última rodada; exportação ignorada")
+                    self.report.set("exportacao", "ignorada_sem_mudancas")
+                    self.config.skip_marker.touch()
+                    return True
                 
-                # Exporta para CSV
-                if not self.export_to_csv():
+                # Exporta para CSV (o download concluído é o ponto de controle da análise)
+                if not self._run_stage("exportacao", self.export_to_csv):
+                    return False
+
+                if not self._run_stage("analise", self.analyzer.analyze_tickets, recover=False):
                     return False
                 
                 # Verifica se houve alterações
@@ -694,7 +1036,8 @@ class SeleniumAutomation:
                         if not self.send_to_slack(current_data):
                             self.logger.warning("Falha ao enviar notificação para o Slack")
                     
-                    # Faz commit das alterações se estiver rodando no GitHub Actions
+                    # Faz commit das alterações se estiver rodando no GitHub Actions. Nunca é
+                    # adiado, nem com o prazo curto: o runner é descartado ao fim da rodada
                     if os.getenv("GITHUB_ACTIONS") == "true":
                         if not self.commit_changes():
                             self.logger.warning("Falha ao fazer commit das alterações")
@@ -709,6 +1052,9 @@ class SeleniumAutomation:
                 if self.driver:
                     self.driver.quit()
                     self.logger.info("Driver Chrome fechado")
+
+                self.report.set("tempo_restante_s", round(self.deadline.remaining(), 1))
+                self.report.save()
             
         except Exception as e:
             self.logger.error(f"Erro durante execução: {str(e)}")
@@ -738,11 +1084,24 @@ def main():
         
         # Cria instâncias
         config = Config()
+        
+        # Uma rodada por vez: se outra estiver em andamento, esta é ignorada
+        lock = RunLock()
+        if not lock.acquire():
+            logger.warning("Outra rodada em andamento; esta execução foi ignorada")
+            return 0
+        
         automation = SeleniumAutomation(config, logger)
         
         # Executa automação
         success = automation.run()
         
+        # No workflow (RUN_STARTED_AT definido) a trava segue para o analisador do mesmo ciclo
+        if success and os.getenv("RUN_STARTED_AT"):
+            lock.hand_off()
+        else:
+            lock.release()
+        
         if success:
             logger.info("Automação concluída com sucesso")
             return 0
@@ -4,7 +4,7 @@ Arquivo de configuração centralizada para a automação.
 
 import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 from dataclasses import dataclass
 
 
@@ -18,6 +18,12 @@ class SeleniumConfig:
     retry_delay: int = 5
     screenshot_on_error: bool = True
     headless_mode: bool = True
+    # "eager" libera a página após o DOM, sem esperar imagens, fontes e outros recursos
+    page_load_strategy: str = "eager"
+    # Perfil persistente (cache HTTP e cookies) reaproveitado entre rodadas; vazio desativa
+    profile_dir: str = "temp/chrome-profile"
+    # CSS bloqueado esconde menus e modais por padrão; só bloqueia se explicitamente ativado
+    block_stylesheets: bool = False
 
 
 @dataclass
@@ -43,6 +49,7 @@ class AppConfig:
     log_level: str = "INFO"
     max_log_files: int = 10
     log_rotation_size: str = "10MB"
+    screenshot_max_size: str = "20MB"
     slack_channel: str = "D0891NR1QRM"  # ID do canal do Slack
     slack_webhook_url: str = ""  # Será preenchido via variável de ambiente
 
@@ -73,10 +80,34 @@ class ConfigManager:
         if os.getenv("ELEMENT_WAIT_TIMEOUT"):
             self.selenium.element_wait_timeout = int(os.getenv("ELEMENT_WAIT_TIMEOUT", "20"))
         
+        if os.getenv("PAGE_LOAD_STRATEGY"):
+            self.selenium.page_load_strategy = os.getenv("PAGE_LOAD_STRATEGY", "eager")
+        
+        if os.getenv("CHROME_PROFILE_DIR") is not None:
+            self.selenium.profile_dir = os.getenv("CHROME_PROFILE_DIR", "")
+        
+        if os.getenv("BLOCK_STYLESHEETS"):
+            self.selenium.block_stylesheets = os.getenv("BLOCK_STYLESHEETS", "false").lower() == "true"
+        
+        if os.getenv("RETRY_ATTEMPTS"):
+            self.selenium.retry_attempts = int(os.getenv("RETRY_ATTEMPTS", "3"))
+        
+        if os.getenv("RETRY_DELAY"):
+            self.selenium.retry_delay = int(os.getenv("RETRY_DELAY", "5"))
+        
         # Configurações de log
         if os.getenv("LOG_LEVEL"):
             self.app.log_level = os.getenv("LOG_LEVEL", "INFO").upper()
         
+        if os.getenv("MAX_LOG_FILES"):
+            self.app.max_log_files = int(os.getenv("MAX_LOG_FILES", "10"))
+        
+        if os.getenv("LOG_ROTATION_SIZE"):
+            self.app.log_rotation_size = os.getenv("LOG_ROTATION_SIZE", "10MB")
+        
+        if os.getenv("SCREENSHOT_MAX_SIZE"):
+            self.app.screenshot_max_size = os.getenv("SCREENSHOT_MAX_SIZE", "20MB")
+        
         # Configurações do Slack
         if os.getenv("SLACK_WEBHOOK_URL"):
             self.app.slack_webhook_url = os.getenv("SLACK_WEBHOOK_URL")
@@ -99,9 +130,27 @@ class ConfigManager:
             "disable_web_security": True,
             "allow_running_insecure_content": True,
             "disable_features": "VizDisplayCompositor",
-            "user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+            "page_load_strategy": self.selenium.page_load_strategy,
+            "user_data_dir": str(self.paths.base_dir / self.selenium.profile_dir) if self.selenium.profile_dir else None,
         }
     
+    def get_blocked_url_patterns(self) -> List[str]:
+        """Retorna os padrões de URL bloqueados via DevTools (Network.setBlockedURLs)."""
+        patterns = [
+            # Fontes
+            "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+            # Analytics e domínios de terceiros
+            "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+            "*hotjar.com*", "*clarity.ms*", "*facebook.net*", "*connect.facebook.com*",
+            "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*zdassets.com*", "*intercom.io*",
+        ]
+        if self.selenium.block_stylesheets:
+            patterns.append("*.css")
+        # Padrões adicionais separados por vírgula
+        extra = os.getenv("BLOCKED_URL_PATTERNS", "")
+        patterns.extend(pattern.strip() for pattern in extra.split(",") if pattern.strip())
+        return patterns
+    
     def get_download_preferences(self) -> Dict[str, Any]:
         """Retorna preferências de download para o Chrome."""
         return {
@@ -0,0 +1,218 @@
+"""
+Consulta local ao estado atual dos tickets (data/ticket_memory.json).
+
+Pode ser usada como biblioteca:
+
+    index = TicketIndex()
+    index.query(cliente="Hyperlocal", status="Aguardando")
+    index.query(desde=datetime.now() - timedelta(hours=1))
+
+ou como um pequeno serviço HTTP somente leitura (python consulta_tickets.py):
+
+    GET /tickets?cliente=...&responsavel=...&status=...&desde=2025-08-05T10:00&ultimas_horas=1
+    GET /saude
+"""
+
+import os
+import json
+import logging
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from acoes_ticket import action_timestamp
+from roteamento_slack import normalize_key
+
+# Campos indexados da memória e o nome do índice correspondente
+INDEXED_FIELDS = ("cliente", "responsavel", "status")
+
+
+class TicketIndex:
+    """Estado atual dos tickets com índices secundários por cliente, responsável, status e
+    data da última ação.
+
+    `refresh` relê a memória apenas quando o arquivo muda e `apply` atualiza os índices de
+    forma incremental: só os tickets que entraram, saíram ou mudaram são reindexados.
+    """
+
+    def __init__(self, memory_file: Path = Path("data/ticket_memory.json")):
+        self.memory_file = memory_file
+        self.tickets: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[str, Set[str]]] = {field: {} for field in INDEXED_FIELDS}
+        # (last_action_at, ticket_id) ordenado, para consultas por intervalo de tempo
+        self.by_time: List[Tuple[str, str]] = []
+        self.loaded_at: Optional[str] = None
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @staticmethod
+    def _timestamp(entry: Dict[str, Any]) -> str:
+        # Memórias antigas não têm last_action_at; a data sai do cabeçalho da ação
+        return entry.get("last_action_at") or action_timestamp(entry.get("last_action")) or ""
+
+    def _index(self, ticket_id: str, entry: Dict[str, Any]):
+        for field in INDEXED_FIELDS:
+            key = normalize_key(entry.get(field))
+            if key:
+                self.indexes[field].setdefault(key, set()).add(ticket_id)
+        insort(self.by_time, (self._timestamp(entry), ticket_id))
+
+    def _unindex(self, ticket_id: str, entry: Dict[str, Any]):
+        for field in INDEXED_FIELDS:
+            key = normalize_key(entry.get(field))
+            bucket = self.indexes[field].get(key)
+            if bucket is not None:
+                bucket.discard(ticket_id)
+                if not bucket:
+                    del self.indexes[field][key]
+        item = (self._timestamp(entry), ticket_id)
+        position = bisect_left(self.by_time, item)
+        if position < len(self.by_time) and self.by_time[position] == item:
+            del self.by_time[position]
+
+    def apply(self, memory: Dict[str, Dict[str, Any]]) -> int:
+        """Aplica um novo estado da memória; retorna quantos tickets foram reindexados."""
+        with self._lock:
+            changed = 0
+            for ticket_id in set(self.tickets) - set(memory):
+                self._unindex(ticket_id, self.tickets.pop(ticket_id))
+                changed += 1
+            for ticket_id, entry in memory.items():
+                current = self.tickets.get(ticket_id)
+                if current == entry:
+                    continue
+                if current is not None:
+                    self._unindex(ticket_id, current)
+                self.tickets[ticket_id] = entry
+                self._index(ticket_id, entry)
+                changed += 1
+            self.loaded_at = datetime.now().isoformat(timespec="seconds")
+            return changed
+
+    def refresh(self) -> bool:
+        """Relê a memória se o arquivo mudou desde a última leitura."""
+        try:
+            mtime = self.memory_file.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._file_mtime:
+            return False
+        try:
+            with open(self.memory_file, 'r', encoding='utf-8') as f:
+                memory = json.load(f)
+        except Exception as e:
+            logging.error(f"Erro ao carregar memória para consulta: {str(e)}")
+            return False
+        self._file_mtime = mtime
+        changed = self.apply(memory)
+        logging.info(f"Índice de consulta atualizado: {changed} tickets alterados, {len(self.tickets)} no total")
+        return True
+
+    def query(self, cliente: Optional[str] = None, responsavel: Optional[str] = None,
+              status: Optional[str] = None, desde: Optional[datetime] = None,
+              ate: Optional[datetime] = None, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Tickets que atendem a todos os filtros, do mais recente para o mais antigo."""
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            # Começa pelo índice mais seletivo e intersecta com os demais
+            buckets = [
+                self.indexes[field].get(normalize_key(value), set())
+                for field, value in (("cliente", cliente), ("responsavel", responsavel), ("status", status))
+                if value
+            ]
+            for bucket in sorted(buckets, key=len):
+                candidates = set(bucket) if candidates is None else candidates & bucket
+                if not candidates:
+                    return []
+
+            start = bisect_left(self.by_time, (desde.isoformat(timespec="minutes"), "")) if desde else 0
+            end = bisect_left(self.by_time, (ate.isoformat(timespec="minutes"), "")) if ate else len(self.by_time)
+
+            results = []
+            for timestamp, ticket_id in reversed(self.by_time[start:end]):
+                if candidates is not None and ticket_id not in candidates:
+                    continue
+                entry = self.tickets[ticket_id]
+                results.append({
+                    "numero": ticket_id,
+                    "status": entry.get("status"),
+                    "cliente": entry.get("cliente"),
+                    "responsavel": entry.get("responsavel"),
+                    "last_action_number": entry.get("last_action_number"),
+                    "last_action_at": timestamp or None,
+                    "sla": entry.get("sla"),
+                    "last_action": entry.get("last_action"),
+                })
+                if limite and len(results) >= limite:
+                    break
+            return results
+
+
+class _TicketQueryHandler(BaseHTTPRequestHandler):
+    index: TicketIndex
+
+    def _send_json(self, status_code: int, payload: Any):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.index.refresh()
+
+        if url.path == "/saude":
+            self._send_json(200, {"tickets": len(self.index.tickets), "carregado_em": self.index.loaded_at})
+            return
+        if url.path != "/tickets":
+            self._send_json(404, {"erro": "rota não encontrada"})
+            return
+
+        try:
+            desde = datetime.fromisoformat(params["desde"]) if "desde" in params else None
+            if "ultimas_horas" in params:
+                desde = datetime.now() - timedelta(hours=float(params["ultimas_horas"]))
+            ate = datetime.fromisoformat(params["ate"]) if "ate" in params else None
+            limite = int(params["limite"]) if "limite" in params else None
+        except ValueError as e:
+            self._send_json(400, {"erro": f"parâmetro inválido: {str(e)}"})
+            return
+
+        tickets = self.index.query(
+            cliente=params.get("cliente"), responsavel=params.get("responsavel"),
+            status=params.get("status"), desde=desde, ate=ate, limite=limite,
+        )
+        self._send_json(200, {"total": len(tickets), "tickets": tickets})
+
+    def log_message(self, format, *args):
+        logging.debug(f"Consulta {self.address_string()}: {format % args}")
+
+
+def serve(index: TicketIndex, host: str = "127.0.0.1", port: int = 8765):
+    """Sobe o serviço HTTP somente leitura sobre o índice."""
+    handler = type("TicketQueryHandler", (_TicketQueryHandler,), {"index": index})
+    server = ThreadingHTTPServer((host, port), handler)
+    logging.info(f"Consulta de tickets disponível em http://{host}:{port}/tickets")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main():
+    """Função principal."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = TicketIndex(Path(os.getenv("CONSULTA_MEMORIA", "data/ticket_memory.json")))
+    serve(index, os.getenv("CONSULTA_HOST", "127.0.0.1"), int(os.getenv("CONSULTA_PORTA", "8765")))
+
+
+if __name__ == "__main__":
+    main()
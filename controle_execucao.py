@@ -0,0 +1,191 @@
+"""
+Controle da execução: prazo da rodada e relatório do que aconteceu nela.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Callable
+
+
+class RunDeadline:
+    """Prazo total de uma rodada, consultado por todas as etapas.
+
+    A rodada começa em RUN_STARTED_AT (epoch, definido pelo workflow antes dos dois
+    scripts) ou, na falta dele, na criação do objeto. Com o cron a cada 5 minutos, o prazo
+    padrão de 270s deixa folga para a rodada seguinte não se sobrepor a esta.
+    """
+
+    def __init__(self, budget_seconds: float, low_threshold_seconds: float,
+                 started_at: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.budget_seconds = budget_seconds
+        self.low_threshold_seconds = low_threshold_seconds
+        self.clock = clock
+        self.started_at = started_at if started_at is not None else clock()
+
+    @classmethod
+    def from_env(cls) -> "RunDeadline":
+        started_at = os.getenv("RUN_STARTED_AT")
+        return cls(
+            budget_seconds=float(os.getenv("RUN_DEADLINE_SECONDS", "270")),
+            low_threshold_seconds=float(os.getenv("RUN_DEADLINE_LOW_SECONDS", "60")),
+            started_at=float(started_at) if started_at else None,
+        )
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started_at
+
+    def remaining(self) -> float:
+        """Segundos restantes até o fim do prazo (nunca negativo)."""
+        return max(0.0, self.budget_seconds - self.elapsed())
+
+    def is_low(self) -> bool:
+        """Indica que o prazo está acabando e as etapas devem degradar."""
+        return self.remaining() < self.low_threshold_seconds
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class RunReport:
+    """Relatório de uma rodada (etapas, degradações e métricas), salvo em JSON nos logs."""
+
+    def __init__(self, name: str, report_dir: Path = Path("logs")):
+        self.name = name
+        self.report_file = report_dir / f"relatorio_{name}.json"
+        self.data: Dict[str, Any] = {
+            "execucao": name,
+            "inicio": datetime.now().isoformat(timespec="seconds"),
+            "etapas": [],
+            "degradacoes": [],
+        }
+
+    def set(self, key: str, value: Any):
+        """Registra uma métrica ou resultado da rodada."""
+        self.data[key] = value
+
+    def record_stage(self, stage: str, status: str, duration: float, **details):
+        """Registra o resultado de uma etapa."""
+        self.data["etapas"].append({"etapa": stage, "status": status, "duracao_s": round(duration, 3), **details})
+
+    def record_degradation(self, stage: str, reason: str):
+        """Registra uma degradação aplicada para caber no prazo (uma vez por etapa e motivo)."""
+        entry = {"etapa": stage, "motivo": reason}
+        if entry not in self.data["degradacoes"]:
+            logging.warning(f"Degradação em '{stage}': {reason}")
+            self.data["degradacoes"].append(entry)
+
+    @property
+    def degradations(self) -> List[Dict[str, str]]:
+        return self.data["degradacoes"]
+
+    def save(self):
+        """Grava o relatório da rodada."""
+        self.data["fim"] = datetime.now().isoformat(timespec="seconds")
+        try:
+            self.report_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.report_file, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            logging.info(f"Relatório da execução salvo em {self.report_file}")
+        except Exception as e:
+            logging.error(f"Erro ao salvar relatório da execução: {str(e)}")
+
+
+class RunLock:
+    """Trava de execução única entre rodadas, baseada em um arquivo criado atomicamente.
+
+    A trava guarda o pid, o host e o ciclo (RUN_STARTED_AT) de quem a detém. Outro processo
+    do mesmo ciclo (o analisador, depois da automação) pode assumi-la; rodadas diferentes
+    esperam a liberação. Travas mais antigas que `stale_after_seconds`, ou cujo processo
+    não existe mais neste host, são consideradas abandonadas e removidas.
+
+    O arquivo fica no disco local, então a trava só separa execuções no mesmo host (cron
+    ou servidor próprio). No GitHub Actions cada rodada roda em um runner novo e ela não
+    tem efeito: quem impede rodadas simultâneas é o grupo `concurrency` do workflow.
+    """
+
+    def __init__(self, lock_file: Path = Path("temp/run.lock"), stale_after_seconds: Optional[float] = None):
+        self.lock_file = lock_file
+        self.stale_after_seconds = (
+            stale_after_seconds if stale_after_seconds is not None
+            else float(os.getenv("RUN_LOCK_STALE_SECONDS", "600"))
+        )
+        self.cycle = os.getenv("RUN_STARTED_AT") or f"pid-{os.getpid()}"
+        self.acquired = False
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.lock_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _is_stale(self, holder: Dict[str, Any]) -> bool:
+        age = time.time() - holder.get("criado_em", 0)
+        if age > self.stale_after_seconds:
+            return True
+        if holder.get("repassada"):
+            return False
+        # O processo dono terminou sem liberar a trava nem repassá-la para o próximo script do ciclo
+        same_host = holder.get("host") == os.uname().nodename
+        return same_host and not self._process_alive(holder.get("pid", -1))
+
+    def acquire(self) -> bool:
+        """Tenta obter a trava; retorna False se outra rodada estiver em andamento."""
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self._read()
+                if holder.get("ciclo") == self.cycle:
+                    self._write_holder()
+                    self.acquired = True
+                    return True
+                if not self._is_stale(holder):
+                    logging.warning(f"Outra rodada em andamento (trava {self.lock_file}: {holder})")
+                    return False
+                logging.warning(f"Removendo trava abandonada: {holder}")
+                self.lock_file.unlink(missing_ok=True)
+                continue
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._holder_info(), f)
+            self.acquired = True
+            return True
+        return False
+
+    def _holder_info(self, handed_off: bool = False) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(), "host": os.uname().nodename, "ciclo": self.cycle,
+            "criado_em": time.time(), "repassada": handed_off,
+        }
+
+    def _write_holder(self, handed_off: bool = False):
+        with open(self.lock_file, 'w', encoding='utf-8') as f:
+            json.dump(self._holder_info(handed_off), f)
+
+    def hand_off(self):
+        """Mantém a trava para o próximo script do mesmo ciclo (ex.: o analisador)."""
+        if self.acquired:
+            self._write_holder(handed_off=True)
+        self.acquired = False
+
+    def release(self):
+        """Libera a trava, se ainda pertencer a este ciclo."""
+        if self.acquired and self._read().get("ciclo") == self.cycle:
+            self.lock_file.unlink(missing_ok=True)
+        self.acquired = False
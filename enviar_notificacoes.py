@@ -0,0 +1,254 @@
+"""
+Envio das notificações da caixa de saída (data/notificacoes.jsonl) para o Slack.
+
+Roda em um passo próprio do workflow, depois do analisador: a análise só grava as
+notificações, e este script as entrega respeitando o limite de cada canal, confirma cada
+entrega e reagenda as que falharam com espera exponencial. Dentro de um canal, fechamentos
+saem antes de tickets novos, que saem antes de atualizações, e a ordem de gravação desempata;
+as mensagens de um mesmo ticket saem juntas e sempre na ordem de gravação. Se uma mensagem
+falha, as seguintes do mesmo canal esperam por ela.
+
+O envio usa o que resta do prazo da rodada (RUN_STARTED_AT e RUN_DEADLINE_SECONDS, como o
+analisador). As notificações novas já foram versionadas pelo analisador junto com a memória;
+ao final, este script versiona só as confirmações e falhas do envio.
+
+Uso:
+    python enviar_notificacoes.py [--prazo 60]
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import subprocess
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from agendador_notificacoes import PRIORITY_NAMES, TokenBucket
+from controle_execucao import RunDeadline, RunLock, RunReport
+from fila_notificacoes import NotificationOutbox, OutboxEntry, WEBHOOK_DYNAMIC, WEBHOOK_MAIN
+from perfil_llm import percentile
+from registro_logs import setup_async_logging
+
+# Segundos do prazo da rodada reservados para versionar a caixa de saída depois do envio
+SYNC_RESERVE_SECONDS = 15
+
+
+def post_to_slack(webhook_url: str, channel: str, message: str) -> Optional[str]:
+    """Posta a mensagem no webhook; retorna None se deu certo ou a descrição do erro."""
+    try:
+        payload = {"channel": channel, "text": message, "username": "Monitor de Tickets", "icon_emoji": ":ticket:"}
+        response = requests.post(webhook_url, json=payload, timeout=30)
+        if response.status_code != 200:
+            return f"HTTP {response.status_code}: {response.text}"
+        return None
+    except Exception as e:
+        return str(e)
+
+
+class NotificationDrainer:
+    """Entrega as notificações pendentes da caixa de saída, canal a canal, dentro de um prazo.
+
+    Mede também a espera de cada notificação na fila, da gravação pelo analisador até o
+    envio confirmado, por prioridade.
+    """
+
+    def __init__(self, outbox: NotificationOutbox, webhooks: Dict[str, Optional[str]],
+                 rate_per_channel: float = 1.0, burst: float = 1.0, budget_seconds: float = 120.0,
+                 post: Callable[[str, str, str], Optional[str]] = post_to_slack,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                 wall_clock: Callable[[], float] = time.time):
+        self.outbox = outbox
+        self.webhooks = webhooks
+        self.rate_per_channel = rate_per_channel
+        self.burst = burst
+        self.budget_seconds = budget_seconds
+        self.post = post
+        self.clock = clock
+        self.sleep = sleep
+        self.wall_clock = wall_clock
+        self.stats = {"enviadas": 0, "falhas": 0, "abandonadas": 0, "adiadas": 0}
+        self.wait_times: Dict[int, List[float]] = {}
+
+    def _deliver(self, entry: OutboxEntry) -> bool:
+        webhook_url = self.webhooks.get(entry.webhook)
+        error = (
+            self.post(webhook_url, entry.channel, entry.message) if webhook_url
+            else f"webhook '{entry.webhook}' não configurado"
+        )
+        if error is None:
+            self.outbox.ack(entry.id)
+            self.stats["enviadas"] += 1
+            if entry.created_at:
+                waited = self.wall_clock() - datetime.fromisoformat(entry.created_at).timestamp()
+                self.wait_times.setdefault(entry.priority, []).append(max(0.0, waited))
+            return True
+
+        logging.error(f"Erro ao enviar notificação do ticket #{entry.ticket_id} para o canal {entry.channel}: {error}")
+        self.stats["falhas"] += 1
+        if self.outbox.fail(entry.id, error):
+            self.stats["abandonadas"] += 1
+        return False
+
+    @staticmethod
+    def _channel_order(entries: List[OutboxEntry]) -> List[OutboxEntry]:
+        """Ordena as mensagens de um canal, já recebidas por (prioridade, id).
+
+        Cada ticket assume a posição da sua mensagem mais prioritária, e as mensagens dele
+        seguem juntas em ordem de gravação: um fechamento nunca passa à frente de uma
+        atualização anterior do mesmo ticket.
+        """
+        ticket_keys: Dict[str, Tuple[int, int]] = {}
+        for entry in entries:
+            ticket_keys.setdefault(entry.ticket_id, (entry.priority, entry.id))
+        return sorted(entries, key=lambda entry: (ticket_keys[entry.ticket_id], entry.id))
+
+    def drain(self) -> Dict[str, Any]:
+        """Envia o que estiver pendente e vencido; o restante fica para a próxima execução."""
+        started = self.clock()
+        now_epoch = time.time()
+        by_channel: Dict[str, List[OutboxEntry]] = {}
+        for entry in self.outbox.pending():
+            by_channel.setdefault(entry.channel, []).append(entry)
+
+        queues: Dict[str, Deque[OutboxEntry]] = {}
+        for channel, entries in by_channel.items():
+            channel_queue: Deque[OutboxEntry] = deque()
+            for entry in self._channel_order(entries):
+                # Uma mensagem em espera de retentativa segura as seguintes do mesmo canal
+                if entry.next_attempt_at > now_epoch:
+                    break
+                channel_queue.append(entry)
+            if channel_queue:
+                queues[channel] = channel_queue
+
+        buckets = {channel: TokenBucket(self.rate_per_channel, self.burst, started) for channel in queues}
+        while queues:
+            if self.clock() - started >= self.budget_seconds:
+                self.stats["adiadas"] = sum(len(queue) for queue in queues.values())
+                logging.warning(f"Prazo do envio esgotado; {self.stats['adiadas']} notificações ficam para a próxima execução")
+                break
+
+            now = self.clock()
+            # Entre os canais com envio liberado, o de mensagem mais prioritária vai primeiro
+            ordered = sorted(queues, key=lambda channel: (queues[channel][0].priority, queues[channel][0].id))
+            channel = next((channel for channel in ordered if buckets[channel].try_consume(now)), None)
+            if channel is None:
+                self.sleep(min(buckets[channel].wait_time(now) for channel in queues))
+                continue
+
+            delivered = self._deliver(queues[channel].popleft())
+            # Depois de uma falha, o restante do canal espera a retentativa para manter a ordem
+            if not delivered or not queues[channel]:
+                del queues[channel]
+
+        if any(self.stats.values()):
+            logging.info(
+                f"Envio de notificações: {self.stats['enviadas']} enviadas, {self.stats['falhas']} falhas, "
+                f"{self.stats['abandonadas']} abandonadas, {self.stats['adiadas']} adiadas"
+            )
+        return {**self.stats, "espera_por_prioridade": self.wait_report()}
+
+    def wait_report(self) -> Dict[str, Any]:
+        """Resume a espera na fila (gravação até envio) das notificações enviadas, por prioridade."""
+        summary = {}
+        for priority, waits in sorted(self.wait_times.items()):
+            summary[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "enviadas": len(waits),
+                "espera_media_s": round(sum(waits) / len(waits), 1),
+                "espera_p95_s": round(percentile(waits, 0.95), 1),
+                "espera_max_s": round(max(waits), 1),
+            }
+        if summary:
+            logging.info(f"Espera na fila por prioridade (gravação até envio): {summary}")
+        return summary
+
+
+def _webhooks_from_env() -> Dict[str, Optional[str]]:
+    main_webhook = os.getenv("SLACK_WEBHOOK_URL")
+    return {
+        WEBHOOK_MAIN: main_webhook,
+        WEBHOOK_DYNAMIC: os.getenv("SLACK_DYNAMIC_WEBHOOK_URL") or main_webhook,
+    }
+
+
+def _sync_outbox(outbox_file: Path):
+    """Versiona a caixa de saída com as confirmações, para a próxima rodada não reenviar."""
+    try:
+        subprocess.run(['git', 'config', '--global', 'user.email', 'github-actions@github.com'], check=True)
+        subprocess.run(['git', 'config', '--global', 'user.name', 'GitHub Actions'], check=True)
+        subprocess.run(['git', 'add', str(outbox_file)], check=True)
+
+        result = subprocess.run(['git', 'diff', '--staged', '--quiet'], capture_output=True)
+        if result.returncode == 1:
+            commit_message = f'chore: atualiza caixa de saída de notificações - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+            subprocess.run(['git', 'commit', '-m', commit_message], check=True)
+            subprocess.run(['git', 'push'], check=True)
+            logging.info("Caixa de saída atualizada e enviada para o GitHub")
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Erro ao salvar caixa de saída no GitHub: {str(e)}")
+
+
+def main() -> int:
+    """Função principal."""
+    load_dotenv()
+    setup_async_logging("envio_notificacoes.log", "INFO")
+
+    parser = argparse.ArgumentParser(description="Envia as notificações pendentes da caixa de saída para o Slack")
+    parser.add_argument("--caixa", type=Path, default=Path(os.getenv("ENVIO_CAIXA", "data/notificacoes.jsonl")))
+    parser.add_argument("--prazo", type=float, default=float(os.getenv("ENVIO_PRAZO_S", "0")) or None,
+                        help="Limite adicional, em segundos, ao que resta do prazo da rodada")
+    args = parser.parse_args()
+
+    if not args.caixa.exists():
+        logging.info("Nenhuma caixa de saída de notificações; nada a enviar")
+        return 0
+
+    # Uma trava própria: o envio não disputa a trava da rodada de análise
+    lock = RunLock(Path("temp/envio.lock"))
+    if not lock.acquire():
+        logging.warning("Outro envio em andamento; execução ignorada")
+        return 0
+
+    try:
+        # O envio divide o prazo com a rodada: sem RUN_STARTED_AT, ele conta a partir de agora
+        budget = max(0.0, RunDeadline.from_env().remaining() - SYNC_RESERVE_SECONDS)
+        if args.prazo:
+            budget = min(budget, args.prazo)
+
+        outbox = NotificationOutbox(
+            args.caixa,
+            max_attempts=int(os.getenv("ENVIO_MAX_TENTATIVAS", "10")),
+            retry_delay=float(os.getenv("ENVIO_ESPERA_S", "30")),
+        )
+        report = RunReport("envio")
+        report.set("prazo_envio_s", round(budget, 1))
+        try:
+            drainer = NotificationDrainer(
+                outbox, _webhooks_from_env(),
+                rate_per_channel=float(os.getenv("SLACK_RATE_PER_CHANNEL", "1.0")),
+                burst=float(os.getenv("SLACK_BURST", "1")),
+                budget_seconds=budget,
+            )
+            report.set("envio", drainer.drain())
+            report.set("removidas", outbox.purge(int(os.getenv("ENVIO_RETENCAO_DIAS", "7"))))
+            report.set("caixa_saida", outbox.counts())
+        finally:
+            outbox.close()
+            report.save()
+            # Confirmações e falhas do envio, mesmo se ele parou no meio
+            if os.getenv("GITHUB_ACTIONS") == "true":
+                _sync_outbox(args.caixa)
+        return 0
+    finally:
+        lock.release()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Caixa de saída durável das notificações do Slack (arquivo JSONL versionado no git).
+
+O analisador grava cada notificação aqui e versiona a caixa no mesmo commit da memória de
+tickets; o envio fica por conta de enviar_notificacoes.py, que versiona as confirmações. A
+chave (ticket, número da ação, canal) torna a gravação idempotente: se a rodada cair depois
+de gravar a caixa e antes de salvar a memória, a próxima rodada detecta as mesmas ações e a
+caixa ignora as repetidas.
+
+O arquivo só recebe linhas no final: cada linha é uma notificação nova ou uma mudança de
+estado (entrega, falha) de uma notificação anterior, identificada pelo id. O diff de cada
+rodada fica em poucas linhas de texto, e `purge` só reescreve o arquivo quando há entregas
+antigas a descartar.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+STATUS_PENDING = "pendente"
+STATUS_SENT = "enviada"
+STATUS_FAILED = "falha"
+
+# Webhook usado no envio: o dinâmico (notificações de ticket) ou o principal
+WEBHOOK_DYNAMIC = "dinamico"
+WEBHOOK_MAIN = "principal"
+
+# Estado de uma notificação recém-gravada; as linhas seguintes do mesmo id o atualizam
+INITIAL_STATE = {"status": STATUS_PENDING, "attempts": 0, "next_attempt_at": 0.0, "last_error": None, "sent_at": None}
+
+
+@dataclass
+class OutboxEntry:
+    """Notificação gravada na caixa de saída."""
+    id: int
+    ticket_id: str
+    action_number: int
+    channel: str
+    webhook: str
+    priority: int
+    message: str
+    attempts: int
+    next_attempt_at: float
+    created_at: str = ""
+
+
+class NotificationOutbox:
+    """Caixa de saída das notificações, com entrega confirmada e retentativas com espera exponencial.
+
+    Uso:
+        outbox = NotificationOutbox()
+        outbox.enqueue("148451", 12, "C123", "🔄 *Atualização no Ticket #148451* ...")
+        for entry in outbox.pending():
+            ...
+            outbox.ack(entry.id)  # ou outbox.fail(entry.id, "erro")
+        outbox.close()
+    """
+
+    def __init__(self, path: Path = Path("data/notificacoes.jsonl"), max_attempts: int = 10,
+                 retry_delay: float = 30.0, max_retry_delay: float = 3600.0,
+                 clock=time.time):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.clock = clock
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._keys: Dict[Tuple[str, int, str], int] = {}
+        self._next_id = 1
+        self._file = None
+        self._needs_newline = False
+        # Gravações vindas das threads do pipeline, serializadas pela trava
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        # Uma rodada interrompida no meio da gravação deixa a última linha cortada
+        self._needs_newline = bool(content) and not content.endswith("\n")
+        for line_number, line in enumerate(content.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                logging.warning(f"Linha {line_number} da caixa de saída ignorada: {str(e)}")
+
+    def _apply(self, change: Dict[str, Any]):
+        record = self._records.get(change["id"])
+        if record is None:
+            record = self._records[change["id"]] = dict(INITIAL_STATE)
+        record.update(change)
+        if "ticket_id" in change:
+            self._keys[(record["ticket_id"], record["action_number"], record["channel"])] = record["id"]
+        self._next_id = max(self._next_id, record["id"] + 1)
+
+    def _append(self, change: Dict[str, Any]):
+        """Aplica a mudança e a acrescenta ao arquivo (chamado com a trava)."""
+        self._apply(change)
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._needs_newline:
+                self._file.write("\n")
+                self._needs_newline = False
+        self._file.write(json.dumps(change, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def enqueue(self, ticket_id: str, action_number: int, channel: str, message: str,
+                priority: int = 0, webhook: str = WEBHOOK_DYNAMIC) -> bool:
+        """Grava a notificação; retorna False se a mesma (ticket, ação, canal) já estava na caixa."""
+        with self._lock:
+            if (ticket_id, action_number, channel) in self._keys:
+                return False
+            self._append({
+                "id": self._next_id, "ticket_id": ticket_id, "action_number": action_number,
+                "channel": channel, "webhook": webhook, "priority": priority, "message": message,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+            })
+        return True
+
+    def contains(self, ticket_id: str, action_number: int, channel: str) -> bool:
+        """Indica se a notificação já foi gravada (enviada ou não)."""
+        with self._lock:
+            return (ticket_id, action_number, channel) in self._keys
+
+    def pending(self, limit: Optional[int] = None) -> List[OutboxEntry]:
+        """Notificações ainda não entregues (inclusive as em espera), por prioridade e ordem de gravação."""
+        with self._lock:
+            records = sorted(
+                (record for record in self._records.values() if record["status"] == STATUS_PENDING),
+                key=lambda record: (record["priority"], record["id"]),
+            )
+        if limit:
+            records = records[:limit]
+        return [
+            OutboxEntry(record["id"], record["ticket_id"], record["action_number"], record["channel"],
+                        record["webhook"], record["priority"], record["message"], record["attempts"],
+                        record["next_attempt_at"], record.get("created_at", ""))
+            for record in records
+        ]
+
+    def ack(self, entry_id: int):
+        """Confirma a entrega."""
+        with self._lock:
+            self._append({"id": entry_id, "status": STATUS_SENT, "sent_at": datetime.now().isoformat(timespec="seconds")})
+
+    def fail(self, entry_id: int, error: str) -> bool:
+        """Registra a falha e agenda a próxima tentativa; retorna True se a notificação foi abandonada."""
+        with self._lock:
+            attempts = self._records[entry_id]["attempts"] + 1
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** (attempts - 1))
+            status = STATUS_FAILED if attempts >= self.max_attempts else STATUS_PENDING
+            self._append({
+                "id": entry_id, "status": status, "attempts": attempts,
+                "next_attempt_at": self.clock() + delay, "last_error": error[:500],
+            })
+        if status == STATUS_FAILED:
+            logging.error(f"Notificação {entry_id} abandonada após {attempts} tentativas: {error}")
+        return status == STATUS_FAILED
+
+    def purge(self, keep_days: int) -> int:
+        """Remove as notificações entregues há mais de `keep_days` dias; retorna quantas saíram.
+
+        Só então o arquivo é reescrito, com uma linha consolidada por notificação.
+        """
+        cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat(timespec="seconds")
+        with self._lock:
+            expired = [
+                entry_id for entry_id, record in self._records.items()
+                if record["status"] == STATUS_SENT and (record["sent_at"] or "") < cutoff
+            ]
+            if not expired:
+                return 0
+            for entry_id in expired:
+                record = self._records.pop(entry_id)
+                self._keys.pop((record["ticket_id"], record["action_number"], record["channel"]), None)
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for entry_id in sorted(self._records):
+                    f.write(json.dumps(self._records[entry_id], ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.replace(temp_path, self.path)
+            self._needs_newline = False
+        return len(expired)
+
+    def counts(self) -> Dict[str, int]:
+        """Quantidade de notificações por status."""
+        with self._lock:
+            return dict(Counter(record["status"] for record in self._records.values()))
@@ -0,0 +1,233 @@
+"""
+Leitura da exportação de tickets com acesso preguiçoso à coluna "Ações".
+
+A coluna "Ações" traz o texto completo de todas as ações de cada ticket e domina o
+tamanho do arquivo. O leitor mapeia o CSV em memória, guarda apenas os offsets de bytes
+desse campo durante a varredura e só decodifica o texto dos tickets que precisarem dele.
+"""
+
+import re
+import mmap
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from acoes_ticket import ACTION_SEPARATOR, ActionHeader, action_headers, last_action_details, parse_action_header
+
+DELIMITER = ord(";")
+QUOTE = ord('"')
+NEWLINE = ord("\n")
+
+ACTION_SEPARATOR_BYTES = ACTION_SEPARATOR.encode("ascii")
+# Número no início de cada ação, como em "12 - Ação criada por..."
+ACTION_NUMBER_PATTERN = re.compile(rb"\s*(\d+) ")
+# O cabeçalho "N - Ação criada por <autor> em dd/mm/aaaa hh:mm" cabe nestes bytes
+ACTION_HEADER_MAX_BYTES = 256
+
+# (início, fim, entre aspas) de cada campo de um registro
+FieldSpan = Tuple[int, int, bool]
+
+
+def iter_record_spans(buf, start: int, end: int) -> Iterator[Tuple[int, List[FieldSpan]]]:
+    """Percorre os registros entre `start` e `end`, retornando (offset, campos) de cada um.
+
+    Segue as regras do CSV da exportação (";" como separador, aspas com "" de escape e
+    quebras de linha permitidas dentro de campos entre aspas) usando apenas buscas por
+    bytes, sem copiar o conteúdo dos campos.
+    """
+    pos = start
+    while pos < end:
+        record_start = pos
+        fields: List[FieldSpan] = []
+        while True:
+            if pos < end and buf[pos] == QUOTE:
+                search = pos + 1
+                while True:
+                    closing = buf.find(b'"', search, end)
+                    if closing == -1:
+                        closing = end
+                        break
+                    if closing + 1 < end and buf[closing + 1] == QUOTE:
+                        search = closing + 2
+                        continue
+                    break
+                fields.append((pos + 1, closing, True))
+                pos = closing + 1
+                # Ignora qualquer lixo entre a aspa de fechamento e o próximo separador
+                while pos < end and buf[pos] not in (DELIMITER, NEWLINE):
+                    pos += 1
+            else:
+                delimiter = buf.find(b";", pos, end)
+                newline = buf.find(b"\n", pos, end)
+                if newline == -1:
+                    newline = end
+                field_end = delimiter if delimiter != -1 and delimiter < newline else newline
+                value_end = field_end
+                if value_end > pos and buf[value_end - 1] == ord("\r"):
+                    value_end -= 1
+                fields.append((pos, value_end, False))
+                pos = field_end
+
+            if pos < end and buf[pos] == DELIMITER:
+                pos += 1
+                continue
+            # Fim do registro: "\n", "\r\n" ou fim do intervalo
+            pos += 1
+            break
+
+        if len(fields) > 1 or fields[0][1] > fields[0][0]:
+            yield record_start, fields
+
+
+def decode_field(buf, span: FieldSpan, encoding: str = "latin1") -> str:
+    """Materializa o texto de um campo."""
+    start, end, quoted = span
+    text = buf[start:end].decode(encoding)
+    return text.replace('""', '"') if quoted else text
+
+
+class TicketRow:
+    """Linha de ticket já materializada (ex.: lida pelo pandas)."""
+
+    def __init__(self, fields: Dict[str, Optional[str]], actions_text: Optional[str]):
+        self.fields = fields
+        self._actions_text = actions_text
+        self._details: Optional[Tuple[int, Optional[str]]] = None
+
+    def __getitem__(self, column: str):
+        return self.fields.get(column)
+
+    def last_action_details(self) -> Tuple[int, Optional[str]]:
+        if self._details is None:
+            self._details = last_action_details(self._actions_text)
+        return self._details
+
+    def last_action_number(self) -> int:
+        return self.last_action_details()[0]
+
+    def action_headers(self, after: int = 0) -> List[ActionHeader]:
+        """Cabeçalhos (número, autor, data) das ações de número maior que `after`."""
+        return action_headers(self._actions_text, after)
+
+
+class LazyTicketRow(TicketRow):
+    """Linha cuja coluna "Ações" continua no arquivo mapeado até ser necessária."""
+
+    def __init__(self, fields: Dict[str, Optional[str]], buf, actions_span: FieldSpan, encoding: str):
+        super().__init__(fields, None)
+        self._buf = buf
+        self._span = actions_span
+        self._encoding = encoding
+        self._last_action: Optional[Tuple[int, int, int]] = None
+
+    def _iter_actions(self) -> Iterator[Tuple[int, int, int]]:
+        """Percorre (número, início, fim) de cada ação sem decodificar o texto."""
+        start, end, _ = self._span
+        segment_start = start
+        while segment_start < end:
+            separator = self._buf.find(ACTION_SEPARATOR_BYTES, segment_start, end)
+            segment_end = end if separator == -1 else separator
+            match = ACTION_NUMBER_PATTERN.match(self._buf, segment_start, segment_end)
+            if match:
+                yield int(match.group(1)), segment_start, segment_end
+            if separator == -1:
+                break
+            segment_start = separator + len(ACTION_SEPARATOR_BYTES)
+
+    def _scan_actions(self) -> Tuple[int, int, int]:
+        """Encontra (número, início, fim) da ação de maior número sem decodificar o texto."""
+        if self._last_action is None:
+            start = self._span[0]
+            self._last_action = max(self._iter_actions(), key=lambda action: action[0], default=(0, start, start))
+        return self._last_action
+
+    def action_headers(self, after: int = 0) -> List[ActionHeader]:
+        """Decodifica só o cabeçalho das ações de número maior que `after`."""
+        headers = []
+        for number, start, end in self._iter_actions():
+            if number <= after:
+                continue
+            header_span = (start, min(end, start + ACTION_HEADER_MAX_BYTES), self._span[2])
+            header = parse_action_header(decode_field(self._buf, header_span, self._encoding).strip())
+            if header:
+                headers.append(header)
+        return sorted(headers)
+
+    def last_action_number(self) -> int:
+        return self._scan_actions()[0]
+
+    def last_action_details(self) -> Tuple[int, Optional[str]]:
+        number, start, end = self._scan_actions()
+        if not number:
+            return 0, None
+        text = decode_field(self._buf, (start, end, self._span[2]), self._encoding).strip()
+        return number, text
+
+    def actions_text(self) -> str:
+        """Materializa a coluna "Ações" inteira (histórico completo do ticket)."""
+        return decode_field(self._buf, self._span, self._encoding)
+
+
+class LazyActionsReader:
+    """Lê a exportação via mmap, deixando a coluna "Ações" para ser materializada sob demanda.
+
+    Uso:
+        with LazyActionsReader("downloads/file.csv") as reader:
+            for row in reader:
+                if row.last_action_number() > anterior:
+                    numero, texto = row.last_action_details()
+    """
+
+    def __init__(self, csv_file, encoding: str = "latin1", actions_column: str = "Ações"):
+        self.csv_file = Path(csv_file)
+        self.encoding = encoding
+        self.actions_column = actions_column
+        self._file = None
+        self.buf = None
+        self.columns: List[str] = []
+        self._data_start = 0
+
+    def __enter__(self) -> "LazyActionsReader":
+        self._file = open(self.csv_file, "rb")
+        self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = next(iter_record_spans(self.buf, 0, len(self.buf)), None)
+        if header is None:
+            raise ValueError(f"Arquivo CSV vazio: {self.csv_file}")
+        record_start, fields = header
+        self.columns = [decode_field(self.buf, span, self.encoding).strip() for span in fields]
+        if self.actions_column not in self.columns:
+            raise ValueError(f"Coluna '{self.actions_column}' não encontrada em {self.csv_file}")
+        # O cabeçalho nunca tem campos com quebra de linha
+        self._data_start = self.buf.find(b"\n", record_start) + 1 or len(self.buf)
+        return self
+
+    def __exit__(self, *exc_info):
+        # As linhas só podem ser usadas dentro do bloco "with"
+        if self.buf is not None:
+            self.buf.close()
+            self.buf = None
+        if self._file:
+            self._file.close()
+
+    @property
+    def data_start(self) -> int:
+        """Offset do primeiro registro após o cabeçalho."""
+        return self._data_start
+
+    def __iter__(self) -> Iterator[LazyTicketRow]:
+        return self.iter_range(self._data_start, len(self.buf))
+
+    def iter_range(self, start: int, end: int) -> Iterator[LazyTicketRow]:
+        """Linhas dos registros entre os offsets `start` e `end` (alinhados a registros)."""
+        actions_index = self.columns.index(self.actions_column)
+        for _, fields in iter_record_spans(self.buf, start, end):
+            if len(fields) > len(self.columns):
+                # Mesmo comportamento do pandas com on_bad_lines='warn': a linha é descartada
+                continue
+            # Linhas curtas são completadas com campos vazios, como no pandas
+            fields = fields + [(0, 0, False)] * (len(self.columns) - len(fields))
+            values = {
+                column: (decode_field(self.buf, span, self.encoding) or None)
+                for index, (column, span) in enumerate(zip(self.columns, fields))
+                if index != actions_index
+            }
+            yield LazyTicketRow(values, self.buf, fields[actions_index], self.encoding)
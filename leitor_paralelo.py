@@ -0,0 +1,153 @@
+"""
+Leitura paralela de exportações grandes, particionadas por faixas de bytes.
+
+O arquivo é dividido em faixas alinhadas ao fim de registros (respeitando campos entre
+aspas com quebras de linha, como a coluna "Ações") e cada faixa é lida em um processo
+separado com o mesmo parser do LazyActionsReader. Os processos devolvem apenas um resumo
+por ticket (campos simples, número e, quando necessário, texto da última ação).
+"""
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from acoes_ticket import ActionHeader
+from leitor_csv import LazyActionsReader, TicketRow
+
+# Leitura em blocos ao contar aspas, para não copiar uma faixa inteira de uma vez
+QUOTE_COUNT_CHUNK = 8 * 1024 * 1024
+
+# (campos sem "Ações", número da última ação, texto da última ação ou None,
+#  cabeçalhos das ações novas)
+TicketSummary = Tuple[Tuple[Optional[str], ...], int, Optional[str], List[ActionHeader]]
+
+
+def _count_quotes(buf, start: int, end: int) -> int:
+    total = 0
+    for chunk_start in range(start, end, QUOTE_COUNT_CHUNK):
+        total += buf[chunk_start:min(end, chunk_start + QUOTE_COUNT_CHUNK)].count(b'"')
+    return total
+
+
+def split_record_ranges(buf, start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    """Divide [start, end) em até `parts` faixas que terminam em fim de registro.
+
+    Uma quebra de linha só encerra um registro se o número de aspas desde o início da
+    faixa for par; com o escape "" a paridade continua valendo.
+    """
+    bounds = [start]
+    target_size = max(1, (end - start) // max(1, parts))
+
+    for index in range(1, parts):
+        range_start = bounds[-1]
+        newline = buf.find(b"\n", max(start + index * target_size, range_start), end)
+        if newline == -1:
+            break
+        parity = _count_quotes(buf, range_start, newline) % 2
+        while parity:
+            next_newline = buf.find(b"\n", newline + 1, end)
+            if next_newline == -1:
+                break
+            parity ^= _count_quotes(buf, newline, next_newline) % 2
+            newline = next_newline
+        if parity:
+            break
+        if newline + 1 < end:
+            bounds.append(newline + 1)
+
+    bounds.append(end)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _parse_range(task) -> List[TicketSummary]:
+    """Processo de trabalho: resume os tickets de uma faixa do arquivo."""
+    csv_file, start, end, encoding, actions_column, id_column, status_column, known_numbers, closed_statuses = task
+    summaries: List[TicketSummary] = []
+    with LazyActionsReader(csv_file, encoding, actions_column) as reader:
+        columns = [column for column in reader.columns if column != actions_column]
+        for row in reader.iter_range(start, end):
+            number = row.last_action_number()
+            text = None
+            headers: List[ActionHeader] = []
+            if number:
+                ticket_id = str(row[id_column])
+                known = known_numbers.get(ticket_id)
+                # O texto só é necessário se a ação avançou ou se o ticket ativo é novo
+                if (known is not None and known != number) or (known is None and row[status_column] not in closed_statuses):
+                    _, text = row.last_action_details()
+                    headers = row.action_headers(known or 0)
+            summaries.append((tuple(row[column] for column in columns), number, text, headers))
+    return summaries
+
+
+class SummaryTicketRow(TicketRow):
+    """Linha montada a partir do resumo devolvido por um processo de trabalho."""
+
+    def __init__(self, fields: Dict[str, Optional[str]], action_number: int, action_text: Optional[str],
+                 headers: List[ActionHeader]):
+        super().__init__(fields, None)
+        self._details = (action_number, action_text)
+        self._headers = headers
+
+    def action_headers(self, after: int = 0) -> List[ActionHeader]:
+        return [header for header in self._headers if header[0] > after]
+
+
+class ParallelExportParser:
+    """Lê a exportação em paralelo, uma faixa de bytes por tarefa do pool de processos.
+
+    Uso:
+        parser = ParallelExportParser("downloads/file.csv", workers=4)
+        rows = parser.parse(known_numbers={"148451": 3}, closed_statuses=("Fechado", "Resolvido"))
+    """
+
+    def __init__(self, csv_file, workers: Optional[int] = None, encoding: str = "latin1",
+                 actions_column: str = "Ações", id_column: str = "Número", status_column: str = "Status",
+                 min_range_bytes: int = 4 * 1024 * 1024):
+        self.csv_file = Path(csv_file)
+        self.workers = workers or os.cpu_count() or 1
+        self.encoding = encoding
+        self.actions_column = actions_column
+        self.id_column = id_column
+        self.status_column = status_column
+        self.min_range_bytes = min_range_bytes
+
+    def _plan_ranges(self) -> Tuple[List[str], List[Tuple[int, int]]]:
+        with LazyActionsReader(self.csv_file, self.encoding, self.actions_column) as reader:
+            size = len(reader.buf)
+            # Algumas faixas a mais que processos equilibram faixas com históricos maiores
+            parts = max(1, min(self.workers * 4, (size - reader.data_start) // self.min_range_bytes))
+            ranges = split_record_ranges(reader.buf, reader.data_start, size, parts)
+            columns = [column for column in reader.columns if column != self.actions_column]
+        return columns, ranges
+
+    def parse(self, known_numbers: Dict[str, int],
+              closed_statuses: Iterable[str] = ()) -> List[SummaryTicketRow]:
+        """Retorna as linhas resumidas, na ordem do arquivo.
+
+        `known_numbers` traz o número da última ação já conhecida de cada ticket: o texto
+        da ação só é extraído quando o número mudou ou quando o ticket ativo é novo.
+        """
+        columns, ranges = self._plan_ranges()
+        closed = frozenset(closed_statuses)
+        tasks = [
+            (str(self.csv_file), start, end, self.encoding, self.actions_column,
+             self.id_column, self.status_column, known_numbers, closed)
+            for start, end in ranges
+        ]
+
+        if len(tasks) <= 1 or self.workers <= 1:
+            results = map(_parse_range, tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                results = list(pool.map(_parse_range, tasks))
+
+        rows = [
+            SummaryTicketRow(dict(zip(columns, values)), number, text, headers)
+            for summaries in results
+            for values, number, text, headers in summaries
+        ]
+        logging.info(f"CSV lido em {len(tasks)} faixas com {min(self.workers, len(tasks))} processos: {len(rows)} tickets")
+        return rows
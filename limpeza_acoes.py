@@ -0,0 +1,184 @@
+"""
+Limpeza determinística das ações de tickets antes do resumo com o Gemini.
+"""
+
+import re
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any
+
+from acoes_ticket import ACTION_HEADER_PATTERN, estimate_tokens
+
+# Início do histórico citado: tudo a partir daqui é a conversa anterior
+QUOTED_HISTORY_PATTERNS = [
+    # "Em ter., 5 de ago. de 2025 às 12:09, Fulano <email> escreveu:"
+    re.compile(r"Em \w{3,}\.?,? \d{1,2} de \w{3,}\.? de \d{4}.{0,200}?escreveu:", re.IGNORECASE | re.DOTALL),
+    # "On Tue, Aug 5, 2025 at 12:09 PM Fulano <email> wrote:"
+    re.compile(r"On \w{3},? .{0,200}?wrote:", re.DOTALL),
+    # Cabeçalho de encaminhamento do Outlook
+    re.compile(r"De: .{0,200}?Enviad[oa]: ", re.DOTALL),
+    re.compile(r"-{3,}\s*(?:Mensagem original|Original Message)\s*-{3,}", re.IGNORECASE),
+    # Linhas citadas (">") ficam coladas no texto da exportação como ">>"
+    re.compile(r">\s*>"),
+]
+
+# Rodapés padrão: tudo a partir daqui é boilerplate
+FOOTER_PATTERNS = [
+    re.compile(r"Salientamos que sua privacidade é muito importante", re.IGNORECASE),
+    re.compile(r"InvoiCy - Líder em gestão e emissão de documentos fiscais", re.IGNORECASE),
+    re.compile(r"Enviado do meu (?:iPhone|Android|celular)", re.IGNORECASE),
+]
+
+# Despedidas que iniciam a assinatura: só no início de uma linha ou logo depois do fim de
+# uma frase, e só cortam quando o que sobra depois é curto e parece nome ou contato
+SIGNATURE_PATTERN = re.compile(
+    r"(?:(?<=\n)|(?<=[.!?]))[ \t]*"
+    r"(?:Atenciosamente|Cordiais Saudações|Abraços?|Att|At\.te|Ótimo dia|Grat[oa]|Gratidão|Obrigad[oa])"
+    r"(?![\wÀ-ÿ])[ \t,.!:-]*",
+    re.IGNORECASE
+)
+SIGNATURE_MAX_TAIL = 300
+# Início de bloco de contato: e-mail, telefone ou site
+CONTACT_START_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.|\(?\+?\d{2}\)?[\s.-]?\d{4}|www\.|https?://", re.IGNORECASE)
+# Palavras de ligação aceitas em nomes ("Fulano de Tal", "Equipe de Suporte")
+NAME_CONNECTORS = {"de", "da", "do", "dos", "das", "e"}
+
+# Ruído removido em qualquer posição
+NOISE_PATTERNS = [
+    re.compile(r"<(?:https?://|mailto:)[^>]*>"),               # links de rodapé entre <>
+    # Telefones: só com DDD entre parênteses ou rótulo; números só com separador ("11 4567-8901",
+    # "98765-4321") podem ser protocolo, ticket ou nota e ficam no texto
+    re.compile(r"(?:\+55\s?)?\(\d{2}\)\s?9?\d{4}[-.\s]?\d{4}\b"),
+    re.compile(r"\b(?:Tel|Telefone|Fone|Cel|Celular|WhatsApp)\b\.?:?\s*\+?\d[\d()\s.-]{7,}\d", re.IGNORECASE),
+    re.compile(r"\?{2,}"),                                   # emojis perdidos na conversão ("????")
+]
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Fim de frase; a exportação cola as frases ("Tudo bem?Analisando..."), então o espaço é opcional
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?])\s*(?=[A-ZÀ-Ý])")
+# Frases sem conteúdo: saudações e cortesias de abertura
+GREETING_PATTERN = re.compile(
+    r"^(?:ol[áa]|oi|bom dia|boa tarde|boa noite|prezad[oa]s?|caro|cara|tudo (?:bem|certo|bom)|como vai)\b",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class CleanedAction:
+    """Resultado da limpeza de uma ação."""
+    text: str           # cabeçalho + corpo limpo
+    body: str           # apenas o corpo limpo
+    original_tokens: int
+    cleaned_tokens: int
+    bypass_llm: bool    # texto curto o suficiente para dispensar o Gemini
+
+
+class ActionCleaner:
+    """Remove histórico citado, assinaturas e rodapés das ações com regras compiladas.
+
+    Ações cujo corpo limpo fica abaixo de `bypass_chars` caracteres são enviadas sem passar
+    pelo Gemini. O total de tokens economizados é acumulado para o relatório da execução.
+    """
+
+    def __init__(self, bypass_chars: int = 280):
+        self.bypass_chars = bypass_chars
+        self.stats = {"acoes": 0, "dispensadas": 0, "tokens_originais": 0, "tokens_enviados": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cut_at_first(text: str, patterns) -> str:
+        """Corta o texto na primeira ocorrência de qualquer um dos padrões."""
+        cut = len(text)
+        for pattern in patterns:
+            match = pattern.search(text)
+            if match and match.start() < cut:
+                cut = match.start()
+        return text[:cut]
+
+    def clean_body(self, body: str) -> str:
+        """Aplica as regras de limpeza ao corpo de uma ação."""
+        body = original = body.replace("\xa0", " ")
+        body = self._cut_at_first(body, QUOTED_HISTORY_PATTERNS)
+        body = self._cut_at_first(body, FOOTER_PATTERNS)
+
+        # A primeira despedida seguida de um trecho curto com cara de assinatura marca o corte;
+        # o corte nunca apaga o corpo inteiro
+        for closing in SIGNATURE_PATTERN.finditer(body):
+            tail = body[closing.end():].strip()
+            if (len(tail) <= SIGNATURE_MAX_TAIL and body[:closing.start()].strip()
+                    and self._looks_like_signature(tail)):
+                body = body[:closing.start()]
+                break
+
+        cleaned = self._remove_noise(body)
+        # Se as regras esvaziaram um corpo com conteúdo, fica o corpo só sem o ruído
+        return cleaned or self._remove_noise(original)
+
+    @staticmethod
+    def _remove_noise(body: str) -> str:
+        for pattern in NOISE_PATTERNS:
+            body = pattern.sub(" ", body)
+        return WHITESPACE_PATTERN.sub(" ", body).strip()
+
+    @staticmethod
+    def _looks_like_signature(tail: str) -> bool:
+        """Indica se o texto depois da despedida parece nome ou bloco de contato."""
+        if not tail or CONTACT_START_PATTERN.match(tail):
+            return True
+        # As primeiras palavras precisam ser nome próprio ("Fulano de Tal", "Equipe Suporte")
+        first_line = re.split(r"[\n|]", tail, maxsplit=1)[0]
+        words = re.findall(r"[\wÀ-ÿ'-]+", first_line)[:3]
+        return bool(words) and words[0][0].isupper() and all(
+            word[0].isupper() or word in NAME_CONNECTORS for word in words
+        )
+
+    def clean(self, action_text: str) -> CleanedAction:
+        """Limpa uma ação, preservando o cabeçalho "N - Ação criada por ... em ..."."""
+        header_match = ACTION_HEADER_PATTERN.match(action_text)
+        header = header_match.group(0).strip() if header_match else ""
+        body = self.clean_body(action_text[header_match.end():] if header_match else action_text)
+
+        text = f"{header}\n{body}" if header else body
+        cleaned = CleanedAction(
+            text=text,
+            body=body,
+            original_tokens=estimate_tokens(action_text),
+            cleaned_tokens=estimate_tokens(text),
+            bypass_llm=len(body) < self.bypass_chars,
+        )
+
+        with self._lock:
+            self.stats["acoes"] += 1
+            self.stats["tokens_originais"] += cleaned.original_tokens
+            if cleaned.bypass_llm:
+                self.stats["dispensadas"] += 1
+            else:
+                self.stats["tokens_enviados"] += cleaned.cleaned_tokens
+        return cleaned
+
+    def report(self) -> Dict[str, Any]:
+        """Resume a economia de tokens da execução e registra no log."""
+        saved = self.stats["tokens_originais"] - self.stats["tokens_enviados"]
+        report = dict(self.stats, tokens_economizados=saved)
+        if self.stats["acoes"]:
+            logging.info(
+                f"Limpeza pré-Gemini: {self.stats['acoes']} ações, {self.stats['dispensadas']} sem Gemini, "
+                f"~{saved} tokens economizados de ~{self.stats['tokens_originais']}"
+            )
+        return report
+
+
+def extractive_summary(cleaned: CleanedAction, max_sentences: int = 2, max_chars: int = 400) -> str:
+    """Resumo local (sem Gemini): as primeiras frases com conteúdo da ação já limpa."""
+    sentences = [
+        sentence.strip()
+        for sentence in SENTENCE_BOUNDARY_PATTERN.split(cleaned.body)
+        if sentence.strip() and not GREETING_PATTERN.match(sentence.strip())
+    ]
+    summary = " ".join(sentences[:max_sentences]) or cleaned.body
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit(" ", 1)[0] + "…"
+
+    header = cleaned.text[:-len(cleaned.body)].strip() if cleaned.body else cleaned.text
+    return f"{header}\n{summary}" if header else summary
@@ -0,0 +1,152 @@
+"""
+Perfil das chamadas ao LLM: latência, tamanhos, tokens, custo, retentativas, fallbacks e cache.
+
+Cada chamada ao modelo é registrada pelo GeminiSummarizer. Os totais do dia e uma janela
+das latências mais recentes ficam em data/llm_uso.json, para dimensionar limites de taxa e
+tamanhos de lote com dados reais das rodadas.
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+# Latências mantidas por tipo de chamada para os percentis móveis
+ROLLING_WINDOW = 500
+# Dias de totais mantidos no arquivo
+DAYS_KEPT = 30
+
+DAILY_COUNTERS = (
+    "chamadas", "erros", "tokens_entrada", "tokens_saida", "caracteres_entrada", "caracteres_saida",
+    "latencia_total_s", "retentativas", "fallbacks", "cache_hits", "cache_misses", "custo_estimado_usd",
+)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Percentil por posição na lista ordenada (sem interpolação)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LlmProfiler:
+    """Registra as chamadas ao LLM da rodada e acumula os totais diários.
+
+    O custo é estimado pelos preços por milhão de tokens em GEMINI_CUSTO_ENTRADA_POR_MILHAO
+    e GEMINI_CUSTO_SAIDA_POR_MILHAO (USD). Os tokens vêm do `usage_metadata` da resposta
+    quando disponível; senão, são estimados pelo tamanho do texto.
+    """
+
+    def __init__(self, path: Path = Path("data/llm_uso.json")):
+        self.path = path
+        self.input_price = float(os.getenv("GEMINI_CUSTO_ENTRADA_POR_MILHAO", "0.075"))
+        self.output_price = float(os.getenv("GEMINI_CUSTO_SAIDA_POR_MILHAO", "0.30"))
+        self.run: Dict[str, Any] = {counter: 0 for counter in DAILY_COUNTERS}
+        self.run_latencies: Dict[str, List[float]] = {}
+        self.days: Dict[str, Dict[str, Any]] = {}
+        self.recent: Dict[str, Deque[float]] = {}
+        # As chamadas podem vir de várias threads de resumo ao mesmo tempo
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.days = data.get("dias", {})
+                self.recent = {
+                    kind: deque(latencies, maxlen=ROLLING_WINDOW)
+                    for kind, latencies in data.get("latencias_recentes", {}).items()
+                }
+        except Exception as e:
+            logging.error(f"Erro ao carregar perfil do LLM: {str(e)}")
+
+    def _add(self, **counters):
+        with self._lock:
+            self._add_unlocked(**counters)
+
+    def _add_unlocked(self, **counters):
+        today = self.days.setdefault(date.today().isoformat(), {counter: 0 for counter in DAILY_COUNTERS})
+        for counter, value in counters.items():
+            self.run[counter] = round(self.run[counter] + value, 6)
+            today[counter] = round(today.get(counter, 0) + value, 6)
+
+    def record_call(self, kind: str, latency: float, prompt_chars: int, response_chars: int,
+                    prompt_tokens: int, response_tokens: int, error: bool = False):
+        """Registra uma chamada ao modelo ("individual" ou "lote")."""
+        cost = (prompt_tokens * self.input_price + response_tokens * self.output_price) / 1_000_000
+        with self._lock:
+            self._add_unlocked(
+                chamadas=1, erros=int(error), tokens_entrada=prompt_tokens, tokens_saida=response_tokens,
+                caracteres_entrada=prompt_chars, caracteres_saida=response_chars,
+                latencia_total_s=latency, custo_estimado_usd=cost,
+            )
+            self.run_latencies.setdefault(kind, []).append(latency)
+            self.recent.setdefault(kind, deque(maxlen=ROLLING_WINDOW)).append(round(latency, 3))
+
+    def record_retry(self, count: int = 1):
+        """Itens refeitos depois de uma chamada que não os resolveu (ex.: omitidos do lote)."""
+        self._add(retentativas=count)
+
+    def record_fallback(self, count: int = 1):
+        """Itens que ficaram sem resumo do LLM (texto original ou resumo extrativo)."""
+        self._add(fallbacks=count)
+
+    def record_cache(self, hit: bool):
+        self._add(**{"cache_hits" if hit else "cache_misses": 1})
+
+    def summary(self) -> Dict[str, Any]:
+        """Totais da rodada e percentis (da rodada e da janela móvel) por tipo de chamada."""
+        latencies = {}
+        for kind in set(self.run_latencies) | set(self.recent):
+            run_values = self.run_latencies.get(kind, [])
+            recent_values = list(self.recent.get(kind, []))
+            latencies[kind] = {
+                "rodada_p50_s": percentile(run_values, 0.5),
+                "rodada_p95_s": percentile(run_values, 0.95),
+                "movel_p50_s": percentile(recent_values, 0.5),
+                "movel_p95_s": percentile(recent_values, 0.95),
+                "movel_p99_s": percentile(recent_values, 0.99),
+                "movel_amostras": len(recent_values),
+            }
+        return {"rodada": dict(self.run), "latencias": latencies, "hoje": self.days.get(date.today().isoformat(), {})}
+
+    def report(self) -> Dict[str, Any]:
+        """Registra no log o resumo da rodada e o retorna."""
+        summary = self.summary()
+        run = summary["rodada"]
+        if run["chamadas"] or run["cache_hits"] or run["fallbacks"]:
+            logging.info(
+                f"LLM: {run['chamadas']} chamadas ({run['erros']} erros), "
+                f"{run['tokens_entrada']} tokens de entrada, {run['tokens_saida']} de saída, "
+                f"~US$ {run['custo_estimado_usd']:.4f}, {run['retentativas']} retentativas, "
+                f"{run['fallbacks']} fallbacks, {run['cache_hits']} acertos de cache"
+            )
+            for kind, stats in summary["latencias"].items():
+                logging.info(f"LLM {kind}: p50 {stats['movel_p50_s']}s, p95 {stats['movel_p95_s']}s "
+                             f"(últimas {stats['movel_amostras']} chamadas)")
+        return summary
+
+    def save(self) -> bool:
+        """Grava os totais diários e a janela de latências; retorna True se houve registro."""
+        if not any(self.run.values()):
+            return False
+        oldest = (date.today() - timedelta(days=DAYS_KEPT)).isoformat()
+        self.days = {day: totals for day, totals in self.days.items() if day > oldest}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+                    "dias": self.days,
+                    "latencias_recentes": {kind: list(values) for kind, values in self.recent.items()},
+                }, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logging.error(f"Erro ao salvar perfil do LLM: {str(e)}")
+        return True
@@ -0,0 +1,197 @@
+"""
+Pipeline de notificações: detecção de mudanças e resumo em estágios simultâneos.
+
+A leitura da exportação (produtor) entrega cada ticket alterado assim que o encontra; um
+grupo de threads resume as ações em pequenos lotes e grava cada mensagem na caixa de saída
+logo em seguida. A fila entre os estágios é limitada e o número de itens em andamento tem
+um teto: quando o Gemini fica lento, a leitura espera, e a memória não cresce com o número
+de tickets alterados.
+
+A ordem e o ritmo de envio ao Slack não são tratados aqui: ficam com enviar_notificacoes.py,
+que lê a caixa de saída por prioridade.
+"""
+
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agendador_notificacoes import PRIORITY_UPDATE
+
+# Marca de fim de fila para as threads de resumo
+_STOP = None
+
+
+@dataclass
+class PipelineItem:
+    """Ticket alterado a caminho da caixa de saída."""
+    ticket_id: str
+    channel: Optional[str]
+    text: str
+    priority: int = PRIORITY_UPDATE
+    context: Dict[str, Any] = field(default_factory=dict)
+    action_number: int = 0
+    summary: Optional[str] = None
+
+
+class NotificationPipeline:
+    """Resume e grava as notificações enquanto a exportação ainda está sendo lida.
+
+    Uso:
+        with NotificationPipeline(summarize, render, save) as pipeline:
+            for ticket in ...:
+                pipeline.submit(PipelineItem(ticket_id, channel, last_action, priority, {...}))
+        pipeline.stats()
+
+    `summarize` recebe {ticket_id: texto} e devolve {ticket_id: resumo}; itens ausentes da
+    resposta (ou um erro no lote) ficam com o texto original. `render` monta a mensagem a
+    partir do item resumido e `save(item, message)` a grava, retornando False (ou levantando
+    uma exceção) se a gravação falhou; as falhas ficam em `failed`.
+    """
+
+    def __init__(self, summarize: Callable[[Dict[str, str]], Dict[str, str]],
+                 render: Callable[[PipelineItem], str],
+                 save: Callable[[PipelineItem, str], Any],
+                 summary_workers: int = 2, max_in_flight: int = 200,
+                 batch_max_items: int = 20, batch_linger: float = 0.2,
+                 clock: Callable[[], float] = time.monotonic):
+        self.summarize = summarize
+        self.render = render
+        self.save = save
+        self.batch_max_items = max(1, batch_max_items)
+        self.batch_linger = batch_linger
+        self.clock = clock
+
+        max_in_flight = max(1, max_in_flight)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._summary_queue: "queue.Queue[Optional[PipelineItem]]" = queue.Queue(maxsize=max_in_flight)
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.saved = 0
+        self.failed = 0
+        self.peak_in_flight = 0
+        self._current_in_flight = 0
+        self.producer_wait = 0.0
+        self.busy = {"resumo": 0.0, "gravacao": 0.0}
+
+        self._summary_threads = [
+            threading.Thread(target=self._summary_worker, name=f"resumo-{index}", daemon=True)
+            for index in range(max(1, summary_workers))
+        ]
+        for thread in self._summary_threads:
+            thread.start()
+
+    def __enter__(self) -> "NotificationPipeline":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Se a leitura falhou, o que ainda não foi gravado é descartado: a memória não será
+        # salva e os tickets voltam a ser detectados na próxima rodada
+        if exc_type is not None:
+            self._cancelled.set()
+        self.close()
+
+    def _release(self):
+        with self._lock:
+            self._current_in_flight -= 1
+        self._in_flight.release()
+
+    def submit(self, item: PipelineItem):
+        """Entrega um ticket alterado ao pipeline; bloqueia enquanto o teto de itens em andamento estiver cheio."""
+        started = self.clock()
+        self._in_flight.acquire()
+        with self._lock:
+            self.producer_wait += self.clock() - started
+            self._current_in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._current_in_flight)
+        self.submitted += 1
+        self._summary_queue.put(item)
+
+    def _next_batch(self) -> Tuple[List[PipelineItem], bool]:
+        """Espera um item e junta os que chegarem em seguida, até o tamanho do lote.
+
+        Retorna o lote e se a marca de fim foi encontrada.
+        """
+        first = self._summary_queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        linger_until = self.clock() + self.batch_linger
+        while len(batch) < self.batch_max_items:
+            remaining = linger_until - self.clock()
+            try:
+                item = self._summary_queue.get(timeout=remaining) if remaining > 0 else self._summary_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _summary_worker(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+            started = self.clock()
+            summaries: Dict[str, str] = {}
+            if not self._cancelled.is_set():
+                try:
+                    summaries = self.summarize({item.ticket_id: item.text for item in batch})
+                except Exception as e:
+                    logging.error(f"Erro ao resumir lote de {len(batch)} ações: {str(e)}", exc_info=True)
+            self._add_busy("resumo", self.clock() - started)
+
+            for item in batch:
+                item.summary = summaries.get(item.ticket_id) or item.text
+                if not self._cancelled.is_set():
+                    self._save(item)
+                self._release()
+
+    def _add_busy(self, stage: str, seconds: float):
+        with self._lock:
+            self.busy[stage] += seconds
+
+    def _save(self, item: PipelineItem):
+        started = self.clock()
+        try:
+            saved = self.save(item, self.render(item)) is not False
+        except Exception as e:
+            logging.error(f"Erro ao gravar notificação do ticket #{item.ticket_id}: {str(e)}")
+            saved = False
+        with self._lock:
+            self.busy["gravacao"] += self.clock() - started
+            if saved:
+                self.saved += 1
+            else:
+                self.failed += 1
+
+    def close(self):
+        """Aguarda o fim dos resumos e gravações pendentes e encerra as threads."""
+        for _ in self._summary_threads:
+            self._summary_queue.put(_STOP)
+        for thread in self._summary_threads:
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Resume o pipeline: itens, pico em andamento, espera do produtor e ocupação de cada estágio."""
+        summary = {
+            "itens": self.submitted,
+            "gravadas": self.saved,
+            "falhas": self.failed,
+            "pico_em_andamento": self.peak_in_flight,
+            "espera_leitura_s": round(self.producer_wait, 3),
+            "ocupacao_resumo_s": round(self.busy["resumo"], 3),
+            "ocupacao_gravacao_s": round(self.busy["gravacao"], 3),
+        }
+        if self.submitted:
+            logging.info(
+                f"Pipeline de notificações: {self.saved}/{self.submitted} gravadas, pico de "
+                f"{self.peak_in_flight} em andamento, leitura aguardou {summary['espera_leitura_s']}s"
+            )
+        return summary
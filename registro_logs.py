@@ -0,0 +1,141 @@
+"""
+Logging assíncrono com rotação limitada e armazenamento limitado de screenshots.
+
+Os registros vão para uma fila em memória e uma thread separada (QueueListener) faz a
+escrita em disco, fora do caminho crítico da rodada. Os arquivos giram por tamanho e
+quantidade (AppConfig.log_rotation_size e AppConfig.max_log_files) e os segmentos
+antigos são compactados com gzip.
+"""
+
+import os
+import re
+import gzip
+import queue
+import atexit
+import shutil
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+
+from config import config
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Registros acima deste limite na fila são descartados em vez de bloquear a rodada
+LOG_QUEUE_SIZE = 10000
+
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?B)?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+_listener: Optional[QueueListener] = None
+
+
+def parse_size(value: str) -> int:
+    """Converte tamanhos como "10MB" ou "512KB" em bytes."""
+    match = SIZE_PATTERN.match(value or "")
+    if not match:
+        raise ValueError(f"Tamanho inválido: {value!r}")
+    unit = (match.group(2) or "B").upper()
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+
+def _gzip_namer(name: str) -> str:
+    return f"{name}.gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    """Compacta o segmento que acabou de girar."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que nunca bloqueia: com a fila cheia, o registro é descartado e contado."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_async_logging(log_name: str, level: Optional[str] = None) -> logging.Logger:
+    """Configura o logging raiz com fila, arquivo rotativo compactado e saída no console.
+
+    Pode ser chamada mais de uma vez no mesmo processo; só a primeira chamada configura.
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None:
+        return root
+
+    log_dir = config.paths.log_dir
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        log_dir / log_name,
+        maxBytes=parse_size(config.app.log_rotation_size),
+        backupCount=config.app.max_log_files,
+        encoding='utf-8',
+    )
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+
+    root.handlers = [queue_handler]
+    root.setLevel(level or config.app.log_level)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_async_logging)
+    return root
+
+
+def stop_async_logging():
+    """Esvazia a fila e encerra a thread de escrita."""
+    global _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    dropped = sum(getattr(handler, "dropped", 0) for handler in root.handlers)
+    _listener.stop()
+    if dropped:
+        # A fila já parou: o aviso vai direto para os handlers de arquivo e console
+        record = root.makeRecord(root.name, logging.WARNING, __file__, 0,
+                                 f"{dropped} registros de log descartados com a fila cheia", None, None)
+        for handler in _listener.handlers:
+            handler.handle(record)
+    _listener = None
+
+
+class ScreenshotStore:
+    """Armazenamento de screenshots em anel, limitado por bytes: ao passar do limite, as
+    capturas mais antigas são removidas."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def enforce(self):
+        """Remove as capturas mais antigas até o total caber no limite."""
+        try:
+            files = sorted(self.directory.glob("*.png"), key=lambda f: f.stat().st_mtime)
+            total = sum(f.stat().st_size for f in files)
+            for oldest in files:
+                if total <= self.max_bytes:
+                    break
+                total -= oldest.stat().st_size
+                oldest.unlink(missing_ok=True)
+        except OSError as e:
+            logging.warning(f"Erro ao limitar o diretório de screenshots: {str(e)}")
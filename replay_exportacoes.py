@@ -0,0 +1,237 @@
+"""
+Replay de exportações arquivadas pelo analisador, sem Slack, Gemini ou git reais.
+
+Os CSVs de um diretório são analisados em sequência (ordem do nome do arquivo), com a
+memória de tickets passando de um snapshot para o seguinte como nas rodadas reais. O Slack
+é substituído por um servidor HTTP local que captura as mensagens (entregues da caixa de
+saída pelo NotificationDrainer ao fim de cada snapshot) e o Gemini por um modelo
+determinístico com latência configurável. O resultado traz as notificações geradas, a
+vazão e o tempo de cada etapa, para comparar versões do analisador.
+
+Uso:
+    python replay_exportacoes.py snapshots/ --memoria data/ticket_memory.json --saida replay.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from enviar_notificacoes import NotificationDrainer
+from fila_notificacoes import WEBHOOK_DYNAMIC, WEBHOOK_MAIN
+from resumo_gemini import BATCH_PROMPT
+
+BATCH_PROMPT_PREFIX = BATCH_PROMPT.split("{items}")[0]
+
+
+class CapturingSlackServer:
+    """Servidor HTTP local que aceita os webhooks do Slack e guarda as mensagens recebidas."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.messages: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                try:
+                    payload = json.loads(body)
+                except json.JSONDecodeError:
+                    payload = {"raw": body.decode("utf-8", "replace")}
+                with server._lock:
+                    server.messages.append(payload)
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/webhook"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "CapturingSlackServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Retorna e limpa as mensagens capturadas até agora."""
+        with self._lock:
+            messages, self.messages = self.messages, []
+        return messages
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGeminiModel:
+    """Substituto determinístico do modelo do Gemini, com latência fixa por chamada.
+
+    Atende tanto o prompt individual quanto o de lote (resposta JSON indexada pelo id).
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, summary_chars: int = 120):
+        self.latency_seconds = latency_seconds
+        self.summary_chars = summary_chars
+        self.calls = 0
+
+    def _summary(self, text: str) -> str:
+        return "Resumo: " + " ".join(text.split())[:self.summary_chars]
+
+    def generate_content(self, prompt: str, request_options: Optional[Dict[str, Any]] = None) -> _StubResponse:
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if prompt.startswith(BATCH_PROMPT_PREFIX):
+            items = json.loads(prompt[len(BATCH_PROMPT_PREFIX):])
+            return _StubResponse(json.dumps({item["id"]: self._summary(item["texto"]) for item in items}, ensure_ascii=False))
+        return _StubResponse(self._summary(prompt.split("\n\n", 1)[-1]))
+
+
+@contextmanager
+def _replay_environment():
+    """Define um canal padrão para as notificações e desliga o prazo da rodada.
+
+    As variáveis voltam aos valores anteriores na saída, para não afetar quem chamou o replay.
+    """
+    keys = ("SLACK_CHANNEL", "RUN_DEADLINE_SECONDS", "RUN_STARTED_AT")
+    previous = {key: os.environ.get(key) for key in keys}
+    os.environ.setdefault("SLACK_CHANNEL", "replay")
+    os.environ["RUN_DEADLINE_SECONDS"] = str(24 * 3600)
+    os.environ.pop("RUN_STARTED_AT", None)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def replay(snapshot_dir: Path, initial_memory: Optional[Path] = None, gemini_latency: float = 0.0,
+           slack_latency: float = 0.0, slack_rate: float = 1000.0) -> Dict[str, Any]:
+    """Analisa os snapshots em sequência e retorna notificações, vazão e tempos por etapa."""
+    snapshots = sorted(snapshot_dir.glob("*.csv"))
+    if not snapshots:
+        raise ValueError(f"Nenhum CSV encontrado em {snapshot_dir}")
+
+    with _replay_environment(), CapturingSlackServer(slack_latency) as slack, \
+            tempfile.TemporaryDirectory(prefix="replay_") as work_dir:
+        # Importado depois do ambiente pronto: o módulo lê variáveis na importação
+        from analisador_tickets import TicketAnalyzer
+        from resumo_gemini import GeminiSummarizer
+
+        data_dir = Path(work_dir) / "data"
+        data_dir.mkdir()
+        if initial_memory:
+            shutil.copy(initial_memory, data_dir / "ticket_memory.json")
+
+        model = StubGeminiModel(gemini_latency)
+        summarizer = GeminiSummarizer()
+        summarizer._model = model
+
+        results, notifications = [], []
+        total_started = time.perf_counter()
+        for snapshot in snapshots:
+            # O relatório fica no diretório temporário, sem sobrescrever o da última rodada real
+            analyzer = TicketAnalyzer(data_dir=data_dir, summarizer=summarizer, git_sync=False,
+                                      report_dir=Path(work_dir) / "logs")
+            calls_before = model.calls
+            started = time.perf_counter()
+            success = analyzer.analyze_tickets(str(snapshot))
+            duration = time.perf_counter() - started
+
+            delivery_started = time.perf_counter()
+            drainer = NotificationDrainer(
+                analyzer.outbox, {WEBHOOK_DYNAMIC: slack.url, WEBHOOK_MAIN: slack.url},
+                rate_per_channel=slack_rate, burst=max(1, int(slack_rate)), budget_seconds=24 * 3600,
+            )
+            delivery = drainer.drain()
+            delivery_duration = time.perf_counter() - delivery_started
+            analyzer.outbox.close()
+
+            messages = slack.drain()
+            notifications.extend(
+                {"snapshot": snapshot.name, "canal": message.get("channel"), "texto": message.get("text")}
+                for message in messages
+            )
+            tickets = analyzer.report.data.get("tickets_lidos", 0)
+            results.append({
+                "snapshot": snapshot.name,
+                "sucesso": success,
+                "duracao_s": round(duration, 3),
+                "tickets": tickets,
+                "tickets_por_s": round(tickets / duration, 1) if duration else None,
+                "notificacoes": len(messages),
+                "envio_s": round(delivery_duration, 3),
+                "falhas_envio": delivery["falhas"],
+                "chamadas_gemini": model.calls - calls_before,
+                "etapas": analyzer.report.data["etapas"],
+            })
+
+        total_duration = time.perf_counter() - total_started
+        total_tickets = sum(result["tickets"] for result in results)
+        return {
+            "snapshots": results,
+            "total": {
+                "snapshots": len(results),
+                "falhas": sum(1 for result in results if not result["sucesso"]),
+                "duracao_s": round(total_duration, 3),
+                "tickets": total_tickets,
+                "tickets_por_s": round(total_tickets / total_duration, 1) if total_duration else None,
+                "notificacoes": len(notifications),
+                "chamadas_gemini": model.calls,
+            },
+            "notificacoes": notifications,
+        }
+
+
+def main() -> int:
+    """Função principal."""
+    parser = argparse.ArgumentParser(description="Replay de exportações arquivadas pelo analisador de tickets")
+    parser.add_argument("snapshots", type=Path, help="Diretório com os CSVs arquivados")
+    parser.add_argument("--memoria", type=Path, help="Memória de tickets inicial (ticket_memory.json)")
+    parser.add_argument("--latencia-gemini", type=float, default=0.0, help="Latência simulada por chamada ao Gemini (s)")
+    parser.add_argument("--latencia-slack", type=float, default=0.0, help="Latência simulada por mensagem no Slack (s)")
+    parser.add_argument("--taxa-slack", type=float, default=1000.0, help="Mensagens por segundo por canal")
+    parser.add_argument("--saida", type=Path, help="Arquivo JSON com o resultado completo")
+    args = parser.parse_args()
+
+    result = replay(args.snapshots, args.memoria, args.latencia_gemini, args.latencia_slack, args.taxa_slack)
+
+    for snapshot in result["snapshots"]:
+        stages = ", ".join(f"{stage['etapa']}={stage['duracao_s']}s" for stage in snapshot["etapas"])
+        print(f"{snapshot['snapshot']}: {snapshot['tickets']} tickets em {snapshot['duracao_s']}s "
+              f"({snapshot['notificacoes']} notificações, envio em {snapshot['envio_s']}s) [{stages}]")
+    total = result["total"]
+    print(f"Total: {total['tickets']} tickets em {total['duracao_s']}s ({total['tickets_por_s']} tickets/s), "
+          f"{total['notificacoes']} notificações, {total['chamadas_gemini']} chamadas ao Gemini, {total['falhas']} falhas")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if total["falhas"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Resumo das ações de tickets com o Gemini, individualmente ou em lotes.
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import google.generativeai as genai
+
+from acoes_ticket import estimate_tokens
+from controle_execucao import RunDeadline
+from perfil_llm import LlmProfiler
+
+SINGLE_PROMPT = (
+    "Resuma e formate o seguinte texto de uma ação de ticket. Remova saudações, assinaturas e "
+    "informações de rodapé, focando apenas no conteúdo principal da mensagem:\n\n{text}"
+)
+
+BATCH_PROMPT = (
+    "Você receberá uma lista JSON de ações de tickets, cada uma com \"id\" e \"texto\". "
+    "Para cada ação, resuma e formate o texto. Remova saudações, assinaturas e informações de rodapé, "
+    "focando apenas no conteúdo principal da mensagem.\n"
+    "Responda SOMENTE com um objeto JSON em que cada chave é o \"id\" do ticket e cada valor é o "
+    "texto formatado correspondente, sem nenhum texto fora do JSON.\n\n{items}"
+)
+
+# Remove a cerca de código que o modelo às vezes coloca em volta do JSON
+CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# Resumos guardados por texto (ações idênticas em vários tickets, como avisos em massa)
+CACHE_MAX_ITEMS = 512
+
+
+class GeminiSummarizer:
+    """Resume ações de tickets com o Gemini.
+
+    `summarize_batch` agrupa várias ações em uma única chamada, limitada por um orçamento
+    de tokens por lote, e pede uma resposta JSON indexada pelo id do ticket. Itens que o
+    modelo omitir ou devolver malformados são refeitos com chamadas individuais.
+
+    Com um `profiler`, cada chamada registra latência, tamanhos e tokens, além das
+    retentativas, fallbacks e acertos do cache de resumos.
+
+    Cada chamada tem timeout de `request_timeout` segundos, limitado ao que resta do prazo
+    da rodada. Uma resposta vazia (ou bloqueada pelo modelo) não é refeita: o item fica com
+    o texto recebido, já limpo pelo chamador.
+    """
+
+    def __init__(self, model_name: str = 'gemini-1.5-flash', batch_token_budget: int = 6000,
+                 batch_max_items: int = 20, profiler: Optional[LlmProfiler] = None,
+                 request_timeout: float = 60.0):
+        self.model_name = model_name
+        self.batch_token_budget = batch_token_budget
+        self.batch_max_items = batch_max_items
+        self.request_timeout = request_timeout
+        self.profiler = profiler
+        self._model = None
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _request_timeout(self, deadline: Optional[RunDeadline]) -> float:
+        if deadline is None:
+            return self.request_timeout
+        return max(1.0, min(self.request_timeout, deadline.remaining()))
+
+    def _generate(self, prompt: str, kind: str, deadline: Optional[RunDeadline] = None) -> str:
+        """Chama o modelo e registra a chamada no profiler (inclusive quando falha).
+
+        Retorna "" quando o modelo responde sem texto; só exceções contam como erro.
+        """
+        started = time.perf_counter()
+        response_text = ""
+        usage = None
+        failed = True
+        try:
+            response = self.model.generate_content(prompt, request_options={"timeout": self._request_timeout(deadline)})
+            usage = getattr(response, "usage_metadata", None)
+            try:
+                response_text = response.text or ""
+            except ValueError:
+                # Resposta sem candidatos, por exemplo bloqueada pelos filtros do modelo
+                response_text = ""
+            failed = False
+            return response_text
+        finally:
+            if self.profiler:
+                self.profiler.record_call(
+                    kind, time.perf_counter() - started, len(prompt), len(response_text),
+                    getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt),
+                    getattr(usage, "candidates_token_count", None) or (estimate_tokens(response_text) if response_text else 0),
+                    error=failed,
+                )
+
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _cached(self, text: str) -> Optional[str]:
+        with self._cache_lock:
+            summary = self._cache.get(self._cache_key(text))
+        if self.profiler:
+            self.profiler.record_cache(summary is not None)
+        return summary
+
+    def _remember(self, text: str, summary: str):
+        with self._cache_lock:
+            self._cache[self._cache_key(text)] = summary
+            if len(self._cache) > CACHE_MAX_ITEMS:
+                self._cache.popitem(last=False)
+
+    def summarize(self, text: str) -> str:
+        """Resume uma única ação. Em caso de erro, devolve o texto original."""
+        cached = self._cached(text)
+        if cached is not None:
+            return cached
+        return self._summarize_uncached(text)
+
+    def _summarize_uncached(self, text: str, deadline: Optional[RunDeadline] = None) -> str:
+        try:
+            summary = self._generate(SINGLE_PROMPT.format(text=text), "individual", deadline).strip()
+        except Exception as e:
+            logging.error(f"Erro ao formatar com Gemini: {str(e)}")
+            summary = ""
+        if not summary:
+            if self.profiler:
+                self.profiler.record_fallback()
+            return text
+        self._remember(text, summary)
+        return summary
+
+    def _build_batches(self, items: Dict[str, str]) -> List[Dict[str, str]]:
+        """Divide os itens em lotes que respeitam o orçamento de tokens e o máximo de itens."""
+        prompt_overhead = estimate_tokens(BATCH_PROMPT)
+        batches: List[Dict[str, str]] = []
+        current: Dict[str, str] = {}
+        current_tokens = prompt_overhead
+
+        for item_id, text in items.items():
+            # A resposta tem tamanho parecido com a entrada, por isso o custo conta em dobro
+            item_tokens = 2 * estimate_tokens(text)
+            if current and (current_tokens + item_tokens > self.batch_token_budget
+                            or len(current) >= self.batch_max_items):
+                batches.append(current)
+                current, current_tokens = {}, prompt_overhead
+            current[item_id] = text
+            current_tokens += item_tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _parse_batch_response(response_text: str) -> Optional[Dict[str, str]]:
+        """Interpreta a resposta JSON do lote; retorna None se ela não for um objeto válido."""
+        try:
+            parsed = json.loads(CODE_FENCE_PATTERN.sub("", response_text))
+        except (json.JSONDecodeError, TypeError):
+            return None
+        if not isinstance(parsed, dict):
+            return None
+        return {
+            str(key): value.strip()
+            for key, value in parsed.items()
+            if isinstance(value, str) and value.strip()
+        }
+
+    def _summarize_one_batch(self, batch: Dict[str, str], deadline: Optional[RunDeadline] = None) -> Dict[str, str]:
+        """Executa uma chamada para o lote e retorna os resumos válidos recebidos.
+
+        Com uma resposta vazia, todos os itens ficam com o próprio texto, sem nova chamada.
+        """
+        payload = json.dumps([{"id": item_id, "texto": text} for item_id, text in batch.items()], ensure_ascii=False)
+        try:
+            response_text = self._generate(BATCH_PROMPT.format(items=payload), "lote", deadline)
+        except Exception as e:
+            logging.error(f"Erro ao formatar lote com Gemini: {str(e)}")
+            return {}
+
+        if not response_text.strip():
+            logging.warning(f"Resposta vazia do Gemini para lote de {len(batch)} itens; usando o texto limpo")
+            if self.profiler:
+                self.profiler.record_fallback(len(batch))
+            return dict(batch)
+        parsed = self._parse_batch_response(response_text)
+
+        if parsed is None:
+            logging.warning(f"Resposta do Gemini para lote de {len(batch)} itens não é um JSON válido")
+            return {}
+        results = {item_id: parsed[item_id] for item_id in batch if item_id in parsed}
+        for item_id, summary in results.items():
+            self._remember(batch[item_id], summary)
+        return results
+
+    def summarize_batch(self, items: Dict[str, str], deadline: Optional[RunDeadline] = None) -> Dict[str, str]:
+        """Resume várias ações, retornando um dicionário id -> texto formatado.
+
+        Com `deadline`, para de chamar o Gemini quando o prazo da rodada fica curto; os
+        itens ainda não resumidos ficam de fora do resultado para o chamador resolver.
+        """
+        results: Dict[str, str] = {}
+        # Textos já resumidos nesta execução não voltam ao modelo
+        for item_id, text in items.items():
+            cached = self._cached(text)
+            if cached is not None:
+                results[item_id] = cached
+        pending = {item_id: text for item_id, text in items.items() if item_id not in results}
+
+        batches = [batch for batch in self._build_batches(pending) if len(batch) > 1] if len(pending) > 1 else []
+        attempted = set()
+        for batch in batches:
+            if deadline and deadline.is_low():
+                break
+            attempted.update(batch)
+            results.update(self._summarize_one_batch(batch, deadline))
+
+        missing = [item_id for item_id in items if item_id not in results]
+        if missing and batches:
+            logging.info(f"{len(missing)} itens sem resumo no lote; refazendo individualmente")
+            if self.profiler:
+                self.profiler.record_retry(len(attempted.intersection(missing)))
+        for item_id in missing:
+            if deadline and deadline.is_low():
+                break
+            results[item_id] = self._summarize_uncached(items[item_id], deadline)
+
+        if len(items) > 1:
+            logging.info(
+                f"{len(results)} de {len(items)} ações resumidas com {len(batches)} chamadas em lote "
+                f"e {len(missing)} chamadas individuais"
+            )
+        return results
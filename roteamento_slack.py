@@ -0,0 +1,150 @@
+"""
+Índice de roteamento de notificações de tickets para canais do Slack.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+
+def normalize_key(value: Any) -> str:
+    """Normaliza nomes para comparação: sem acentos, sem caixa e sem espaços extras."""
+    if not isinstance(value, str):
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.split()).casefold()
+
+
+class ChannelRouter:
+    """Resolve o canal do Slack de cada ticket a partir de um índice pré-computado.
+
+    O mapeamento aceita o formato antigo (objeto simples cliente -> canal) ou o formato
+    estruturado abaixo, vindo de SLACK_CHANNEL_MAPPING ou do arquivo em
+    SLACK_CHANNEL_MAPPING_FILE (recarregado automaticamente quando é alterado):
+
+        {
+            "clientes": {"Cliente (Pessoa)": "C123"},
+            "prefixos": {"Hyperlocal": "C456"},
+            "regex": {"^Franquia .*SP$": "C789"},
+            "responsaveis": {"Nome do Responsável": "C999"}
+        }
+
+    Precedência: responsável > cliente exato > prefixo mais longo > regex > canal padrão.
+    """
+
+    RELOAD_CHECK_INTERVAL = 5.0  # segundos entre verificações do mtime do arquivo
+
+    def __init__(self, default_channel: Optional[str], mapping_json: Optional[str] = None,
+                 mapping_file: Optional[str] = None):
+        self.default_channel = default_channel
+        self.mapping_json = mapping_json if mapping_json is not None else os.getenv("SLACK_CHANNEL_MAPPING", "{}")
+        mapping_file = mapping_file if mapping_file is not None else os.getenv("SLACK_CHANNEL_MAPPING_FILE")
+        self.mapping_file = Path(mapping_file) if mapping_file else None
+
+        self.exact: Dict[str, str] = {}
+        self.prefixes: List[Tuple[str, str]] = []
+        self.patterns: List[Tuple[re.Pattern, str]] = []
+        self.responsibles: Dict[str, str] = {}
+
+        self._ticket_cache: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        self._file_mtime: Optional[float] = None
+        self._last_check = 0.0
+
+        self._build_index(self._read_mapping())
+
+    def _read_mapping(self) -> Dict[str, Any]:
+        """Lê o mapeamento do arquivo (se configurado) ou da variável de ambiente."""
+        try:
+            if self.mapping_file:
+                if self.mapping_file.exists():
+                    self._file_mtime = self.mapping_file.stat().st_mtime
+                    with open(self.mapping_file, 'r', encoding='utf-8') as f:
+                        return json.load(f)
+                logging.warning(f"Arquivo de mapeamento de canais não encontrado: {self.mapping_file}")
+            return json.loads(self.mapping_json)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.error(f"Erro ao carregar mapeamento de canais: {str(e)}. Verifique o formato JSON.")
+            return {}
+
+    def _build_index(self, mapping: Dict[str, Any]):
+        """Constrói as estruturas de busca com chaves normalizadas."""
+        sections = ("clientes", "prefixos", "regex", "responsaveis")
+        if not any(section in mapping for section in sections):
+            mapping = {"clientes": mapping}
+
+        self.exact = {normalize_key(k): v for k, v in mapping.get("clientes", {}).items()}
+        self.responsibles = {normalize_key(k): v for k, v in mapping.get("responsaveis", {}).items()}
+        # Prefixos mais longos primeiro, para que o mais específico vença
+        self.prefixes = sorted(
+            ((normalize_key(k), v) for k, v in mapping.get("prefixos", {}).items()),
+            key=lambda item: len(item[0]), reverse=True
+        )
+
+        self.patterns = []
+        for pattern, channel in mapping.get("regex", {}).items():
+            try:
+                self.patterns.append((re.compile(pattern, re.IGNORECASE), channel))
+            except re.error as e:
+                logging.error(f"Regex de roteamento inválida '{pattern}': {str(e)}")
+
+        self._ticket_cache.clear()
+        logging.info(
+            f"Índice de canais carregado: {len(self.exact)} clientes, {len(self.prefixes)} prefixos, "
+            f"{len(self.patterns)} regex, {len(self.responsibles)} responsáveis."
+        )
+
+    def maybe_reload(self):
+        """Recarrega o índice se o arquivo de mapeamento foi alterado desde a última leitura."""
+        if not self.mapping_file:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+
+        try:
+            mtime = self.mapping_file.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._file_mtime:
+            logging.info(f"Mapeamento de canais alterado em {self.mapping_file}, recarregando...")
+            self._build_index(self._read_mapping())
+
+    def _resolve(self, cliente: str, responsavel: str) -> Optional[str]:
+        """Aplica as regras de roteamento na ordem de precedência."""
+        responsavel_key = normalize_key(responsavel)
+        if responsavel_key in self.responsibles:
+            return self.responsibles[responsavel_key]
+
+        cliente_key = normalize_key(cliente)
+        if cliente_key in self.exact:
+            return self.exact[cliente_key]
+
+        for prefix, channel in self.prefixes:
+            if cliente_key.startswith(prefix):
+                return channel
+
+        if isinstance(cliente, str):
+            for pattern, channel in self.patterns:
+                if pattern.search(cliente.strip()):
+                    return channel
+
+        return self.default_channel
+
+    def route(self, ticket_id: str, cliente: Any, responsavel: Any = None) -> Optional[str]:
+        """Retorna o canal do ticket, usando o cache enquanto cliente e responsável não mudarem."""
+        self.maybe_reload()
+
+        cached = self._ticket_cache.get(ticket_id)
+        if cached and cached[0] == cliente and cached[1] == responsavel:
+            return cached[2]
+
+        channel = self._resolve(cliente, responsavel)
+        self._ticket_cache[ticket_id] = (cliente, responsavel, channel)
+        return channel
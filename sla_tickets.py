@@ -0,0 +1,146 @@
+"""
+Tempos de resposta e SLA por ticket e por cliente, mantidos de forma incremental.
+
+Cada rodada só processa os cabeçalhos das ações novas ("N - Ação criada por <autor> em
+dd/mm/aaaa hh:mm"): o estado de cada ticket fica na memória de tickets e os totais por
+cliente em data/sla_clientes.json, então o custo é proporcional às ações novas e não ao
+histórico completo.
+"""
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from acoes_ticket import ActionHeader
+
+# Totais acumulados por cliente
+CLIENT_COUNTERS = ("responses", "response_minutes_total", "first_responses", "first_response_minutes_total")
+
+
+def _minutes_between(start: str, end: str) -> float:
+    return max(0.0, (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() / 60)
+
+
+class SlaTracker:
+    """Atualiza o estado de SLA de cada ticket a partir das ações novas.
+
+    Estado por ticket (guardado em `memory[ticket]['sla']`):
+        opened_at                 primeira ação vista
+        awaiting_since            ação do cliente ainda sem resposta interna (ou None)
+        last_customer_action_at   última ação externa
+        last_internal_action_at   última ação interna
+        first_response_minutes    da primeira ação do cliente à primeira resposta interna
+        responses                 respostas internas a ações do cliente
+        response_minutes_total    soma das esperas do cliente até cada resposta
+        response_minutes_max      maior espera
+    """
+
+    def __init__(self, is_internal: Callable[[str], bool], path: Path = Path("data/sla_clientes.json")):
+        self.is_internal = is_internal
+        self.path = path
+        self.clients: Dict[str, Dict[str, Any]] = self._load()
+        self._changed = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("clientes", {})
+        except Exception as e:
+            logging.error(f"Erro ao carregar agregados de SLA: {str(e)}")
+        return {}
+
+    def update(self, cliente: Optional[str], state: Optional[Dict[str, Any]],
+               headers: Iterable[ActionHeader]) -> Optional[Dict[str, Any]]:
+        """Aplica as ações novas (em ordem crescente) ao estado do ticket e aos totais do cliente."""
+        headers = list(headers)
+        if not headers:
+            return state
+
+        state = dict(state or {
+            "opened_at": None, "awaiting_since": None,
+            "last_customer_action_at": None, "last_internal_action_at": None,
+            "first_response_minutes": None, "responses": 0,
+            "response_minutes_total": 0.0, "response_minutes_max": 0.0,
+        })
+        totals = self.clients.setdefault(cliente or "(sem cliente)", {
+            **{counter: 0 for counter in CLIENT_COUNTERS}, "response_minutes_max": 0.0,
+        })
+
+        for _, autor, created_at in headers:
+            state["opened_at"] = state["opened_at"] or created_at
+            if not self.is_internal(autor):
+                state["last_customer_action_at"] = created_at
+                state["awaiting_since"] = state["awaiting_since"] or created_at
+                continue
+
+            state["last_internal_action_at"] = created_at
+            if state["awaiting_since"] is None:
+                continue
+            wait = round(_minutes_between(state["awaiting_since"], created_at), 1)
+            state["awaiting_since"] = None
+            state["responses"] += 1
+            state["response_minutes_total"] = round(state["response_minutes_total"] + wait, 1)
+            state["response_minutes_max"] = max(state["response_minutes_max"], wait)
+            totals["responses"] += 1
+            totals["response_minutes_total"] = round(totals["response_minutes_total"] + wait, 1)
+            totals["response_minutes_max"] = max(totals["response_minutes_max"], wait)
+            if state["first_response_minutes"] is None:
+                state["first_response_minutes"] = wait
+                totals["first_responses"] += 1
+                totals["first_response_minutes_total"] = round(totals["first_response_minutes_total"] + wait, 1)
+
+        self._changed = True
+        return state
+
+    def client_summary(self, memory: Dict[str, Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        """Indicadores por cliente: médias dos totais acumulados e idade dos tickets abertos."""
+        now_iso = (now or datetime.now()).isoformat(timespec="minutes")
+        summary: Dict[str, Dict[str, Any]] = {}
+        for cliente, totals in self.clients.items():
+            summary[cliente] = {
+                "tempo_medio_resposta_min": round(totals["response_minutes_total"] / totals["responses"], 1) if totals["responses"] else None,
+                "tempo_maximo_resposta_min": totals["response_minutes_max"],
+                "tempo_medio_primeira_resposta_min": (
+                    round(totals["first_response_minutes_total"] / totals["first_responses"], 1) if totals["first_responses"] else None
+                ),
+                "abertos": 0, "aguardando_resposta": 0,
+                "idade_maxima_aberto_min": None, "maior_espera_atual_min": None,
+            }
+
+        for entry in memory.values():
+            sla = entry.get("sla")
+            if not sla:
+                continue
+            client = summary.get(entry.get("cliente") or "(sem cliente)")
+            if client is None:
+                continue
+            client["abertos"] += 1
+            if sla.get("opened_at"):
+                age = round(_minutes_between(sla["opened_at"], now_iso), 1)
+                client["idade_maxima_aberto_min"] = max(client["idade_maxima_aberto_min"] or 0, age)
+            if sla.get("awaiting_since"):
+                client["aguardando_resposta"] += 1
+                waiting = round(_minutes_between(sla["awaiting_since"], now_iso), 1)
+                client["maior_espera_atual_min"] = max(client["maior_espera_atual_min"] or 0, waiting)
+        return summary
+
+    def save(self, memory: Dict[str, Dict[str, Any]]) -> bool:
+        """Grava os totais e o resumo por cliente; retorna True se houve ações novas na rodada."""
+        if not self._changed:
+            return False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+                    "clientes": self.clients,
+                    "resumo": self.client_summary(memory),
+                }, f, ensure_ascii=False, indent=2)
+            logging.info(f"Agregados de SLA salvos para {len(self.clients)} clientes")
+        except Exception as e:
+            logging.error(f"Erro ao salvar agregados de SLA: {str(e)}")
+        self._changed = False
+        return True
@@ -0,0 +1,239 @@
+import time
+
+import pytest
+
+from agendador_notificacoes import PRIORITY_CLOSED, PRIORITY_NEW, PRIORITY_UPDATE
+from enviar_notificacoes import NotificationDrainer
+from fila_notificacoes import NotificationOutbox, STATUS_FAILED, STATUS_PENDING, STATUS_SENT, WEBHOOK_MAIN
+
+WEBHOOKS = {"dinamico": "https://hooks.slack.test/dinamico", WEBHOOK_MAIN: "https://hooks.slack.test/principal"}
+
+
+class FakeClock:
+    """Relógio controlado pelo teste; `sleep` só avança o tempo."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class FakeSlack:
+    """Registra as postagens e falha nas mensagens indicadas."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.posts = []
+
+    def __call__(self, webhook_url, channel, message):
+        if message in self.failing:
+            return "HTTP 500: erro"
+        self.posts.append((channel, message))
+        return None
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = NotificationOutbox(tmp_path / "notificacoes.jsonl", max_attempts=3, retry_delay=30, max_retry_delay=50)
+    yield outbox
+    outbox.close()
+
+
+def _drainer(outbox, slack, budget_seconds=60.0):
+    clock = FakeClock()
+    return NotificationDrainer(outbox, WEBHOOKS, rate_per_channel=1.0, burst=1.0, budget_seconds=budget_seconds,
+                               post=slack, clock=clock, sleep=clock.sleep)
+
+
+def test_enqueue_ignores_repeated_notifications(outbox):
+    assert outbox.enqueue("148451", 3, "C1", "primeira") is True
+    assert outbox.enqueue("148451", 3, "C1", "repetida") is False
+    # Outro canal ou outra ação são notificações diferentes
+    assert outbox.enqueue("148451", 3, "C2", "outro canal") is True
+    assert outbox.enqueue("148451", 4, "C1", "nova ação") is True
+
+    assert outbox.contains("148451", 3, "C1")
+    assert not outbox.contains("148451", 5, "C1")
+    assert [entry.message for entry in outbox.pending()] == ["primeira", "outro canal", "nova ação"]
+
+
+def test_state_survives_reopening_and_torn_last_line(tmp_path):
+    path = tmp_path / "notificacoes.jsonl"
+    outbox = NotificationOutbox(path, retry_delay=30)
+    outbox.enqueue("1", 1, "C1", "enviada")
+    outbox.enqueue("2", 1, "C1", "com falha")
+    sent, failed = outbox.pending()
+    outbox.ack(sent.id)
+    outbox.fail(failed.id, "HTTP 500")
+    outbox.close()
+    # Rodada interrompida no meio de uma gravação
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": 3, "ticket_id": "3"')
+
+    outbox = NotificationOutbox(path)
+    assert outbox.counts() == {STATUS_SENT: 1, STATUS_PENDING: 1}
+    assert outbox.contains("1", 1, "C1") and not outbox.contains("3", 1, "C1")
+    entry, = outbox.pending()
+    assert (entry.message, entry.attempts) == ("com falha", 1)
+    # A próxima gravação começa em uma linha nova e recebe um id novo
+    assert outbox.enqueue("4", 1, "C1", "nova") is True
+    outbox.close()
+    assert [entry.ticket_id for entry in NotificationOutbox(path).pending()] == ["2", "4"]
+
+
+def test_file_only_grows_until_purge_compacts_it(tmp_path):
+    path = tmp_path / "notificacoes.jsonl"
+    outbox = NotificationOutbox(path)
+    for index in range(3):
+        outbox.enqueue(str(index), 1, "C1", f"mensagem {index}")
+    first, second, _ = outbox.pending()
+    outbox.ack(first.id)
+    outbox.ack(second.id)
+    before = path.read_text(encoding="utf-8")
+    assert len(before.splitlines()) == 5
+
+    assert outbox.purge(7) == 0
+    assert path.read_text(encoding="utf-8") == before
+
+    # Entregas antigas saem, e cada notificação restante vira uma única linha
+    assert outbox.purge(-1) == 2
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1 and '"mensagem 2"' in lines[0]
+    assert not outbox.contains("0", 1, "C1")
+    outbox.enqueue("5", 1, "C1", "depois da compactação")
+    outbox.close()
+    assert [entry.ticket_id for entry in NotificationOutbox(path).pending()] == ["2", "5"]
+
+
+def test_pending_is_ordered_by_priority_then_insertion(outbox):
+    outbox.enqueue("1", 1, "C1", "upd-1", PRIORITY_UPDATE)
+    outbox.enqueue("2", 1, "C1", "novo", PRIORITY_NEW)
+    outbox.enqueue("3", 1, "C1", "fechado", PRIORITY_CLOSED)
+    outbox.enqueue("4", 1, "C1", "upd-2", PRIORITY_UPDATE)
+
+    assert [entry.message for entry in outbox.pending()] == ["fechado", "novo", "upd-1", "upd-2"]
+
+
+def test_fail_backs_off_exponentially_and_gives_up(tmp_path):
+    clock = FakeClock()
+    outbox = NotificationOutbox(tmp_path / "notificacoes.jsonl", max_attempts=3, retry_delay=30,
+                                max_retry_delay=50, clock=clock)
+    outbox.enqueue("148451", 1, "C1", "mensagem")
+    entry_id = outbox.pending()[0].id
+
+    assert outbox.fail(entry_id, "HTTP 500") is False
+    entry, = outbox.pending()
+    assert (entry.attempts, entry.next_attempt_at) == (1, 1030.0)
+
+    assert outbox.fail(entry_id, "HTTP 500") is False
+    entry, = outbox.pending()
+    # 30s e depois 60s, limitado a max_retry_delay
+    assert (entry.attempts, entry.next_attempt_at) == (2, 1050.0)
+
+    assert outbox.fail(entry_id, "HTTP 500") is True
+    assert outbox.pending() == []
+    assert outbox.counts() == {STATUS_FAILED: 1}
+    outbox.close()
+
+
+def test_drain_sends_by_priority_and_acks(outbox):
+    outbox.enqueue("1", 1, "C1", "upd", PRIORITY_UPDATE)
+    outbox.enqueue("2", 1, "C1", "fechado", PRIORITY_CLOSED)
+    outbox.enqueue("3", 1, "C2", "novo", PRIORITY_NEW)
+    outbox.enqueue("4", 1, "C2", "aviso", webhook=WEBHOOK_MAIN)
+    slack = FakeSlack()
+
+    stats = _drainer(outbox, slack).drain()
+
+    assert slack.posts == [("C1", "fechado"), ("C2", "aviso"), ("C2", "novo"), ("C1", "upd")]
+    assert stats["enviadas"] == 4 and stats["falhas"] == 0
+    assert outbox.counts() == {STATUS_SENT: 4}
+
+
+def test_messages_of_a_ticket_keep_their_order(outbox):
+    outbox.enqueue("1", 5, "C1", "1: atualização", PRIORITY_UPDATE)
+    outbox.enqueue("2", 3, "C1", "2: atualização", PRIORITY_UPDATE)
+    outbox.enqueue("3", 1, "C1", "3: novo", PRIORITY_NEW)
+    # O fechamento leva o ticket 1 para a frente, sem passar da atualização anterior dele
+    outbox.enqueue("1", 6, "C1", "1: fechado", PRIORITY_CLOSED)
+    slack = FakeSlack()
+
+    _drainer(outbox, slack).drain()
+
+    assert [message for _, message in slack.posts] == ["1: atualização", "1: fechado", "3: novo", "2: atualização"]
+
+
+def test_failure_holds_back_the_rest_of_the_channel(outbox):
+    outbox.enqueue("1", 1, "C1", "falha")
+    outbox.enqueue("2", 1, "C1", "depois")
+    outbox.enqueue("3", 1, "C2", "outro canal")
+    slack = FakeSlack(failing={"falha"})
+
+    stats = _drainer(outbox, slack).drain()
+    assert slack.posts == [("C2", "outro canal")]
+    assert stats["falhas"] == 1 and stats["enviadas"] == 1
+
+    # Na próxima execução a mensagem ainda está em espera e continua segurando o canal
+    outbox.enqueue("4", 1, "C2", "mais uma")
+    slack = FakeSlack()
+    _drainer(outbox, slack).drain()
+    assert slack.posts == [("C2", "mais uma")]
+    assert [entry.message for entry in outbox.pending()] == ["falha", "depois"]
+
+
+def test_due_retry_is_sent_before_the_rest_of_the_channel(tmp_path):
+    # Falha registrada há mais tempo que a espera: a retentativa já venceu
+    outbox = NotificationOutbox(tmp_path / "notificacoes.jsonl", clock=lambda: time.time() - 3600)
+    outbox.enqueue("1", 1, "C1", "primeira")
+    outbox.enqueue("2", 1, "C1", "segunda")
+    outbox.fail(outbox.pending()[0].id, "HTTP 500")
+
+    slack = FakeSlack()
+    _drainer(outbox, slack).drain()
+    assert slack.posts == [("C1", "primeira"), ("C1", "segunda")]
+    outbox.close()
+
+
+def test_missing_webhook_counts_as_failure(outbox):
+    outbox.enqueue("1", 1, "C1", "sem webhook")
+    drainer = _drainer(outbox, FakeSlack())
+    drainer.webhooks = {}
+
+    assert drainer.drain()["falhas"] == 1
+    entry, = outbox.pending()
+    assert entry.attempts == 1 and entry.next_attempt_at > time.time()
+
+
+def test_drain_stops_at_budget(outbox):
+    for index in range(5):
+        outbox.enqueue(str(index), 1, "C1", f"mensagem {index}")
+    slack = FakeSlack()
+
+    # Um envio por segundo no canal: em 2,5s saem 3 mensagens
+    stats = _drainer(outbox, slack, budget_seconds=2.5).drain()
+
+    assert len(slack.posts) == 3
+    assert stats["adiadas"] == 2
+    assert [entry.message for entry in outbox.pending()] == ["mensagem 3", "mensagem 4"]
+    assert all(entry.attempts == 0 for entry in outbox.pending())
+    assert STATUS_PENDING in outbox.counts()
+
+
+def test_drain_reports_queue_wait_per_priority(outbox):
+    outbox.enqueue("1", 1, "C1", "fechado", PRIORITY_CLOSED)
+    outbox.enqueue("2", 1, "C1", "upd", PRIORITY_UPDATE)
+    outbox.enqueue("3", 1, "C2", "falha", PRIORITY_UPDATE)
+    drainer = _drainer(outbox, FakeSlack(failing={"falha"}))
+    # Envio 90s depois da gravação
+    drainer.wall_clock = lambda: time.time() + 90
+
+    waits = drainer.drain()["espera_por_prioridade"]
+
+    # Só entregas confirmadas contam
+    assert set(waits) == {"fechamento", "atualizacao"}
+    assert waits["atualizacao"]["enviadas"] == 1
+    assert 90 <= waits["fechamento"]["espera_max_s"] < 92
@@ -0,0 +1,84 @@
+import csv
+
+import pytest
+
+from acoes_ticket import ACTION_SEPARATOR
+from leitor_csv import LazyActionsReader, TicketRow, decode_field, iter_record_spans
+
+COLUMNS = ["Número", "Status", "Cliente (Pessoa)", "Responsável", "Ações"]
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _actions(*texts: str) -> str:
+    return ACTION_SEPARATOR.join(texts)
+
+
+ROWS = [
+    ["148451", "Aguardando", "Hyperlocal", "Ana", _actions(
+        "1 - Ação criada por Cliente em 05/08/2025 10:00\nBom dia; a nota 554 foi rejeitada.",
+        "2 - Ação criada por Ana em 05/08/2025 11:00\nVerificando o \"XML\" enviado;\nretorno em breve.",
+    )],
+    ["148452", "Fechado", "Franquia; SP", "", _actions(
+        "1 - Ação criada por Cliente em 04/08/2025 09:00\nLinha 1\r\nLinha 2",
+        "3 - Ação criada por Bruno em 04/08/2025 12:00\n\"Resolvido\"",
+    )],
+    ["148453", "Novo", "Cliente \"A\"", "Carla", "1 - Ação criada por Cliente em 06/08/2025 08:30\nSem separador"],
+]
+
+
+@pytest.fixture
+def export_csv(tmp_path):
+    path = tmp_path / "file.csv"
+    lines = [";".join(COLUMNS)]
+    for row in ROWS:
+        # Campos simples sem aspas quando possível, como na exportação; os demais entre aspas
+        lines.append(";".join(
+            value if value and not any(c in value for c in ';"\n\r') else _quote(value) for value in row
+        ))
+    path.write_bytes(("\r\n".join(lines) + "\r\n").encode("latin1"))
+    return path
+
+
+def test_iter_record_spans_handles_quotes_separators_and_newlines():
+    buf = b'a;"b;1";"c\n""2""";d\r\n;"";x\nlast'
+    records = [
+        [decode_field(buf, span) for span in fields]
+        for _, fields in iter_record_spans(buf, 0, len(buf))
+    ]
+    assert records == [["a", "b;1", 'c\n"2"', "d"], ["", "", "x"], ["last"]]
+
+
+def test_lazy_reader_matches_csv_module(export_csv):
+    with open(export_csv, newline="", encoding="latin1") as f:
+        expected = [row for row in csv.reader(f, delimiter=";")][1:]
+
+    with LazyActionsReader(export_csv) as reader:
+        assert reader.columns == COLUMNS
+        rows = [
+            [row[column] or "" for column in COLUMNS[:-1]] + [row.actions_text()]
+            for row in reader
+        ]
+
+    assert rows == expected
+
+
+def test_lazy_reader_matches_pandas(export_csv):
+    pd = pytest.importorskip("pandas")
+    # Mesmos parâmetros do leitor pandas do analisador
+    df = pd.read_csv(
+        export_csv, encoding='latin1', sep=';', on_bad_lines='warn',
+        engine='python', quoting=0, dtype={'Número': str, 'Status': str, 'Ações': str, 'Cliente (Pessoa)': str}
+    )
+    pandas_rows = [TicketRow(ticket.to_dict(), ticket['Ações']) for _, ticket in df.iterrows()]
+
+    with LazyActionsReader(export_csv) as reader:
+        lazy_rows = list(reader)
+        assert len(lazy_rows) == len(pandas_rows)
+        for lazy, eager in zip(lazy_rows, pandas_rows):
+            for column in ("Número", "Status", "Cliente (Pessoa)"):
+                assert lazy[column] == eager[column]
+            assert lazy.last_action_details() == eager.last_action_details()
+            assert lazy.action_headers(1) == eager.action_headers(1)
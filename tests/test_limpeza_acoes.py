@@ -0,0 +1,21 @@
+import pytest
+
+from limpeza_acoes import ActionCleaner
+
+
+@pytest.mark.parametrize("body", [
+    "Protocolo 12345678901 gerado na SEFAZ.",
+    "Segue o ticket 98765-4321 para acompanhamento.",
+    "Nota 11 4567-8901 rejeitada.",
+])
+def test_protocol_and_ticket_numbers_are_kept(body):
+    assert ActionCleaner().clean_body(body) == body
+
+
+@pytest.mark.parametrize("body", [
+    "Pode ligar no Tel: 11 98765-4321 amanhã.",
+    "Pode ligar no (11) 98765-4321 amanhã.",
+    "Pode ligar no WhatsApp +55 11 987654321 amanhã.",
+])
+def test_phones_with_label_or_area_code_are_removed(body):
+    assert ActionCleaner().clean_body(body) == "Pode ligar no amanhã."
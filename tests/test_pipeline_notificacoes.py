@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+
+import pytest
+
+from pipeline_notificacoes import NotificationPipeline, PipelineItem
+
+
+class Recorder:
+    """Guarda as mensagens gravadas pelo pipeline."""
+
+    def __init__(self):
+        self.saved = []
+        self._lock = threading.Lock()
+
+    def save(self, item, message):
+        with self._lock:
+            self.saved.append((item.channel, item.ticket_id, message))
+
+
+def _render(item):
+    return item.summary
+
+
+def test_every_item_is_saved_with_its_summary_when_batches_finish_out_of_order():
+    rng = random.Random(7)
+    recorder = Recorder()
+
+    def summarize(texts):
+        # Lotes terminam em ordem aleatória entre as threads de resumo; alguns ficam sem resumo
+        time.sleep(rng.random() * 0.02)
+        return {ticket_id: text.upper() for ticket_id, text in texts.items() if not ticket_id.endswith("7")}
+
+    with NotificationPipeline(summarize, _render, recorder.save, summary_workers=4, max_in_flight=10,
+                              batch_max_items=3, batch_linger=0.001) as pipeline:
+        for index in range(60):
+            pipeline.submit(PipelineItem(f"t{index}", f"C{index % 3}", f"acao {index}"))
+
+    assert pipeline.saved == 60 and pipeline.failed == 0
+    saved = {ticket_id: message for _, ticket_id, message in recorder.saved}
+    assert len(saved) == 60
+    assert saved["t7"] == "acao 7" and saved["t8"] == "ACAO 8"
+
+
+def test_producer_blocks_at_max_in_flight():
+    recorder = Recorder()
+    gate = threading.Event()
+
+    def save(item, message):
+        gate.wait(5)
+        recorder.save(item, message)
+
+    pipeline = NotificationPipeline(lambda texts: {}, _render, save, max_in_flight=3, batch_linger=0)
+    producer = threading.Thread(target=lambda: [
+        pipeline.submit(PipelineItem(f"t{index}", "C1", "acao")) for index in range(10)
+    ])
+    producer.start()
+    time.sleep(0.2)
+    # Com a gravação parada, a leitura não passa do teto de itens em andamento
+    assert pipeline.submitted == 3
+    gate.set()
+    producer.join(5)
+    pipeline.close()
+
+    assert pipeline.saved == 10
+    assert pipeline.peak_in_flight <= 3
+    assert pipeline.stats()["itens"] == 10
+
+
+def test_failure_while_reading_discards_pending_messages():
+    recorder = Recorder()
+
+    def summarize(texts):
+        time.sleep(0.1)
+        return {}
+
+    with pytest.raises(RuntimeError):
+        with NotificationPipeline(summarize, _render, recorder.save, batch_linger=0) as pipeline:
+            for index in range(5):
+                pipeline.submit(PipelineItem(f"t{index}", "C1", "acao"))
+            raise RuntimeError("falha na leitura")
+
+    assert recorder.saved == []
+    assert pipeline.saved == 0 and pipeline.failed == 0
+    # Todos os itens devolveram sua vaga, e as threads terminaram
+    assert pipeline._current_in_flight == 0
+    assert not any(thread.is_alive() for thread in pipeline._summary_threads)
+
+
+def test_failed_saves_are_counted():
+    def save(item, message):
+        if item.ticket_id == "t1":
+            raise OSError("disco cheio")
+        return item.ticket_id != "t2"
+
+    with NotificationPipeline(lambda texts: {}, _render, save, batch_linger=0) as pipeline:
+        for index in range(4):
+            pipeline.submit(PipelineItem(f"t{index}", "C1", "acao"))
+
+    assert pipeline.saved == 2 and pipeline.failed == 2
@@ -0,0 +1,158 @@
+"""
+Lápides dos tickets fechados: evita reprocessar e renotificar tickets já encerrados.
+"""
+
+import json
+import logging
+from array import array
+from bisect import bisect_left
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Acima deste intervalo de ids o bitmap ficaria grande demais; usa um set no lugar
+MAX_BITMAP_SPAN = 64 * 1024 * 1024
+
+
+class ClosedTicketTombstones:
+    """Conjunto compacto de tickets fechados, com o número da última ação e o dia do fechamento.
+
+    Os dados ficam em arrays ordenados por id (busca por bisect) e a pertinência é
+    respondida em O(1) por um bitmap indexado pelo id. Alterações da rodada ficam numa
+    camada à parte até `save`, que também descarta as lápides mais antigas que
+    `max_age_days`.
+    """
+
+    def __init__(self, path: Path = Path("data/closed_tickets.json"), max_age_days: int = 90):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.ids = array('q')
+        self.action_numbers = array('l')
+        self.days = array('l')
+        self._bitmap = bytearray()
+        self._bitmap_offset = 0
+        self._id_set: Optional[set] = None
+        # id -> (número da ação, dia) ou None para remoção
+        self._changes: Dict[int, Optional[Tuple[int, int]]] = {}
+        self._load()
+
+    @staticmethod
+    def _key(ticket_id: str) -> Optional[int]:
+        try:
+            return int(ticket_id)
+        except (TypeError, ValueError):
+            return None
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.ids = array('q', data.get("ids", []))
+                self.action_numbers = array('l', data.get("acoes", []))
+                self.days = array('l', data.get("dias", []))
+        except Exception as e:
+            logging.error(f"Erro ao carregar lápides de tickets fechados: {str(e)}")
+        self._build_membership()
+        logging.info(f"{len(self.ids)} tickets fechados carregados")
+
+    def _build_membership(self):
+        """Monta o bitmap de pertinência a partir dos ids ordenados."""
+        self._bitmap = bytearray()
+        self._id_set = None
+        if not self.ids:
+            return
+        self._bitmap_offset = self.ids[0]
+        span = self.ids[-1] - self.ids[0] + 1
+        if span > MAX_BITMAP_SPAN:
+            self._id_set = set(self.ids)
+            return
+        self._bitmap = bytearray((span + 7) // 8)
+        for ticket_key in self.ids:
+            bit = ticket_key - self._bitmap_offset
+            self._bitmap[bit >> 3] |= 1 << (bit & 7)
+
+    def _in_base(self, ticket_key: int) -> bool:
+        if self._id_set is not None:
+            return ticket_key in self._id_set
+        bit = ticket_key - self._bitmap_offset
+        if bit < 0 or bit >= len(self._bitmap) * 8:
+            return False
+        return bool(self._bitmap[bit >> 3] & (1 << (bit & 7)))
+
+    def __contains__(self, ticket_id: str) -> bool:
+        ticket_key = self._key(ticket_id)
+        if ticket_key is None:
+            return False
+        if ticket_key in self._changes:
+            return self._changes[ticket_key] is not None
+        return self._in_base(ticket_key)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, ticket_id: str) -> Optional[Tuple[int, int]]:
+        """Retorna (número da última ação, dia do fechamento) do ticket, se houver lápide."""
+        ticket_key = self._key(ticket_id)
+        if ticket_key is None:
+            return None
+        if ticket_key in self._changes:
+            return self._changes[ticket_key]
+        if not self._in_base(ticket_key):
+            return None
+        index = bisect_left(self.ids, ticket_key)
+        return self.action_numbers[index], self.days[index]
+
+    def add(self, ticket_id: str, action_number: int, day: Optional[int] = None):
+        """Registra o fechamento de um ticket."""
+        ticket_key = self._key(ticket_id)
+        if ticket_key is not None:
+            self._changes[ticket_key] = (action_number, day if day is not None else date.today().toordinal())
+
+    def discard(self, ticket_id: str):
+        """Remove a lápide (ex.: ticket reaberto)."""
+        ticket_key = self._key(ticket_id)
+        if ticket_key is not None:
+            self._changes[ticket_key] = None
+
+    def save(self) -> bool:
+        """Aplica as alterações da rodada, expira lápides antigas e grava o arquivo.
+
+        Retorna True se o conteúdo mudou.
+        """
+        min_day = date.today().toordinal() - self.max_age_days
+        merged = {
+            ticket_key: (number, day)
+            for ticket_key, number, day in zip(self.ids, self.action_numbers, self.days)
+        }
+        for ticket_key, value in self._changes.items():
+            if value is None:
+                merged.pop(ticket_key, None)
+            else:
+                merged[ticket_key] = value
+
+        ordered = sorted((k, v) for k, v in merged.items() if v[1] >= min_day)
+        ids = array('q', (k for k, _ in ordered))
+        action_numbers = array('l', (v[0] for _, v in ordered))
+        days = array('l', (v[1] for _, v in ordered))
+        changed = (ids, action_numbers, days) != (self.ids, self.action_numbers, self.days)
+
+        self.ids, self.action_numbers, self.days = ids, action_numbers, days
+        self._changes.clear()
+        self._build_membership()
+
+        if not changed:
+            return False
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "ids": self.ids.tolist(),
+                    "acoes": self.action_numbers.tolist(),
+                    "dias": self.days.tolist(),
+                }, f, separators=(",", ":"))
+            logging.info(f"Lápides de tickets fechados salvas: {len(self.ids)} tickets")
+        except Exception as e:
+            logging.error(f"Erro ao salvar lápides de tickets fechados: {str(e)}")
+        return True